@@ -1,7 +1,4 @@
-from flask import Flask
-
 def create_app():
-    app = Flask(__name__)
-    with app.app_context():
-        from . import routes  # Import routes
-    return app
+    """Return the Flask app with every route; app.routes builds it on import."""
+    from . import routes
+    return routes.app
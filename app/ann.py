@@ -0,0 +1,224 @@
+"""Approximate nearest-neighbour indexes over the gallery encodings."""
+import hashlib
+import logging
+import os
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_KINDS = ('ivf', 'faiss')
+
+# Rows per block when assigning points to centroids, so building over a
+# large gallery never materializes the full points x centroids matrix
+ASSIGN_CHUNK = 4096
+
+
+def fingerprint(encodings):
+    """Hash of the gallery matrix, used to tell whether a saved index is stale."""
+    return hashlib.sha1(np.ascontiguousarray(encodings, dtype=np.float32).tobytes()).hexdigest()
+
+
+def index_path_for(cache_file, kind):
+    """Return where an index of the given kind is stored, next to the gallery cache."""
+    return f'{os.path.splitext(cache_file)[0]}.{kind}.npz'
+
+
+def _squared_distances(queries, points, point_norms):
+    squared = np.einsum('ij,ij->i', queries, queries)[:, None] + point_norms[None, :]
+    squared -= 2.0 * (queries @ points.T)
+    return np.maximum(squared, 0.0, out=squared)
+
+
+def _nearest_centroids(points, centroids, centroid_norms, chunk=ASSIGN_CHUNK):
+    """Return (nearest centroid, squared distance to it) per row, ASSIGN_CHUNK rows at a time."""
+    assign = np.empty(len(points), dtype=np.int64)
+    nearest = np.empty(len(points), dtype=np.float32)
+    for start in range(0, len(points), chunk):
+        dist = _squared_distances(points[start:start + chunk], centroids, centroid_norms)
+        assign[start:start + chunk] = dist.argmin(axis=1)
+        nearest[start:start + chunk] = dist[np.arange(len(dist)), assign[start:start + chunk]]
+    return assign, nearest
+
+
+def top_k(dist, k):
+    """Return (columns, values) of the k smallest entries of each row, sorted."""
+    if k < dist.shape[1]:
+        top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(dist.shape[1]), dist.shape)
+    top_dist = np.take_along_axis(dist, top, axis=1)
+    order = np.argsort(top_dist, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_dist, order, axis=1)
+
+
+class IVFIndex:
+    """Inverted-file index: k-means coarse quantizer plus exact re-ranking.
+
+    Each query is compared against the `nlist` centroids, and only the
+    gallery rows in the `nprobe` closest lists are scored exactly.
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, centroids, order, offsets, nprobe=16):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+        self.encodings = None
+        self.norms = None
+
+    @classmethod
+    def build(cls, encodings, nlist=None, nprobe=16, iterations=10, seed=0):
+        """Train the coarse quantizer on `encodings` and assign every row to a list."""
+        encodings = np.ascontiguousarray(encodings, dtype=np.float32)
+        n = len(encodings)
+        nlist = max(1, min(n, nlist or int(4 * np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+
+        sample = encodings
+        if n > nlist * 256:
+            sample = encodings[rng.choice(n, nlist * 256, replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+            assign, nearest = _nearest_centroids(sample, centroids, centroid_norms)
+            counts = np.bincount(assign, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = counts == 0
+            centroids[~empty] = sums[~empty] / counts[~empty, None]
+            if empty.any():
+                # Re-seed empty lists with the points farthest from their centroid
+                far = np.argsort(nearest)[-int(empty.sum()):]
+                centroids[empty] = sample[far]
+
+        index = cls(centroids, None, None, nprobe)
+        assign, _ = _nearest_centroids(encodings, index.centroids, index.centroid_norms)
+        index.order = np.argsort(assign, kind='stable').astype(np.int64)
+        index.offsets = np.searchsorted(assign[index.order], np.arange(nlist + 1)).astype(np.int64)
+        index.attach(encodings)
+        return index
+
+    def attach(self, encodings):
+        """Point the index at the gallery matrix it was built from."""
+        self.encodings = np.ascontiguousarray(encodings, dtype=np.float32)
+        self.norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+
+    def search(self, queries, k=1):
+        """Return (indices, distances), both (K, k); missing results are -1 / inf."""
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        if not len(queries):
+            return indices, distances
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        coarse = _squared_distances(queries, self.centroids, self.centroid_norms)
+        probes, _ = top_k(coarse, nprobe)
+        for q, lists in enumerate(probes):
+            ids = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+            if not len(ids):
+                continue
+            dist = _squared_distances(queries[q:q + 1], self.encodings[ids], self.norms[ids])
+            top, top_dist = top_k(dist, min(k, len(ids)))
+            indices[q, :top.shape[1]] = ids[top[0]]
+            distances[q, :top.shape[1]] = np.sqrt(top_dist[0])
+        return indices, distances
+
+    def state(self):
+        return {'centroids': self.centroids, 'order': self.order, 'offsets': self.offsets}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state['centroids'], state['order'], state['offsets'])
+
+
+class FaissIndex:
+    """HNSW graph from faiss, used when the faiss package is installed."""
+
+    kind = 'faiss'
+
+    def __init__(self, index, ef_search=64):
+        self.index = index
+        self.index.hnsw.efSearch = ef_search
+
+    @classmethod
+    def build(cls, encodings, m=32, ef_construction=80, ef_search=64):
+        index = faiss.IndexHNSWFlat(encodings.shape[1], m)
+        index.hnsw.efConstruction = ef_construction
+        index.add(np.ascontiguousarray(encodings, dtype=np.float32))
+        return cls(index, ef_search)
+
+    def attach(self, encodings):
+        pass
+
+    def search(self, queries, k=1):
+        squared, indices = self.index.search(np.ascontiguousarray(queries, dtype=np.float32), k)
+        distances = np.sqrt(np.maximum(squared, 0.0))
+        distances[indices < 0] = np.inf
+        return indices.astype(np.int64), distances
+
+    def state(self):
+        return {'serialized': faiss.serialize_index(self.index)}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(faiss.deserialize_index(state['serialized']))
+
+
+def build_index(kind, encodings, nprobe=16):
+    """Build an index of the given kind over `encodings`."""
+    if kind == 'ivf':
+        return IVFIndex.build(encodings, nprobe=nprobe)
+    if kind == 'faiss':
+        if faiss is None:
+            raise RuntimeError("FACE_INDEX=faiss requires the faiss package")
+        return FaissIndex.build(encodings)
+    raise ValueError(f"Unknown index kind {kind!r}, expected one of {INDEX_KINDS}")
+
+
+def save_index(index_file, index, encodings):
+    """Atomically write an index together with the gallery fingerprint."""
+    tmp_file = f'{index_file}.tmp'
+    with open(tmp_file, 'wb') as f:
+        np.savez(f, kind=np.array(index.kind), fingerprint=np.array(fingerprint(encodings)), **index.state())
+    os.replace(tmp_file, index_file)
+
+
+def load_or_build_index(cache_file, kind, encodings, nprobe=16, save=True):
+    """Load the saved index for this gallery, rebuilding it if the gallery changed.
+
+    With `save` False a rebuilt index is only kept in memory, for processes
+    that share the gallery with one that owns the files.
+    """
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind {kind!r}, expected one of {INDEX_KINDS}")
+    if kind == 'faiss' and faiss is None:
+        raise RuntimeError("FACE_INDEX=faiss requires the faiss package")
+    index_file = index_path_for(cache_file, kind)
+    index_cls = IVFIndex if kind == 'ivf' else FaissIndex
+    if os.path.exists(index_file):
+        try:
+            with np.load(index_file, allow_pickle=False) as data:
+                if str(data['kind']) == kind and str(data['fingerprint']) == fingerprint(encodings):
+                    index = index_cls.from_state({key: data[key] for key in data.files})
+                    index.attach(encodings)
+                    if kind == 'ivf':
+                        index.nprobe = nprobe
+                    return index
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning("Ignoring unreadable index %s: %s", index_file, e)
+
+    logger.info("Building %s index over %d gallery faces...", kind, len(encodings))
+    index = build_index(kind, encodings, nprobe)
+    if save:
+        save_index(index_file, index, encodings)
+    return index
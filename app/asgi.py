@@ -0,0 +1,211 @@
+"""Async front end: frames are accepted on the event loop and recognized in a process pool.
+
+Run with `uvicorn app.asgi:app` (or `python -m app.asgi`). POST /receive_frame,
+POST /receive_faces and the /ws/frames WebSocket are served here; every other route falls
+through to the Flask app in app.routes, which keeps running in a WSGI
+thread pool. Needs starlette, python-multipart, a2wsgi and uvicorn (with
+websockets).
+"""
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route, WebSocketRoute
+from starlette.websockets import WebSocketDisconnect
+
+from . import config, routes
+from .batching import BatchEncoder, encode_faces
+from .flow import FlowController
+from .ingest import decode_chips, parse_boxes, parse_padding
+from .pipeline import detect_frame
+
+logger = logging.getLogger(__name__)
+
+
+class FrameIngest:
+    """Runs detect_frame() in worker processes with bounded concurrency.
+
+    At most `max_inflight` frames are in the pool at once, so its queue
+    never grows; others wait on the event loop, which costs only their
+    bytes. How many may wait is up to the FlowController in front of it.
+
+    The faces found are encoded in batches that mix frames from different
+    requests, also in the pool (one batch per worker at a time).
+    """
+
+    def __init__(self, workers, max_inflight):
+        self.workers = workers
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._pool = None
+        self.batcher = BatchEncoder(lambda: routes.matcher, config.ENCODE_BATCH_FACES,
+                                    config.ENCODE_BATCH_WAIT_MS / 1000.0, workers, self._encode_faces)
+        self.waiting = 0
+        self.processed = 0
+
+    def start(self):
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.batcher.start()
+        return self
+
+    def stop(self):
+        self.batcher.stop()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    def _encode_faces(self, images, locations):
+        return self._pool.submit(encode_faces, images, locations).result()
+
+    async def recognize_chips(self, decoded):
+        """(name, distance) per (chip, face location) from decode_chips(); no detection needed."""
+        futures = [asyncio.wrap_future(self.batcher.submit(chip, [location])) for chip, location in decoded]
+        return [matches[0] for matches in await asyncio.gather(*futures)]
+
+    async def recognize(self, data):
+        """(face locations, (name, distance) per face) for an uploaded frame, or None if it is unreadable."""
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            detected = await asyncio.get_running_loop().run_in_executor(self._pool, detect_frame, data)
+        finally:
+            self._slots.release()
+        self.processed += 1
+        if detected is None:
+            return None
+        imgS, locations = detected
+        return locations, await asyncio.wrap_future(self.batcher.submit(imgS, locations))
+
+    def stats(self):
+        return {"workers": self.workers, "waiting": self.waiting, "processed": self.processed,
+                "batching": self.batcher.stats()}
+
+
+ingest = FrameIngest(config.INGEST_WORKERS, config.INGEST_MAX_INFLIGHT)
+flow = FlowController(config.INGEST_WORKERS, config.INGEST_MAX_INFLIGHT + config.INGEST_MAX_WAITING,
+                      config.STREAM_MIN_FPS, config.STREAM_MAX_FPS)
+
+
+async def receive_frame(request):
+    """Async counterpart of app.routes.receive_frame with the same responses."""
+    form = await request.form()
+    upload = form.get('frame')
+    if upload is None or isinstance(upload, str):
+        return JSONResponse({"status": "error", "message": "No frame received"}, status_code=400)
+
+    token = flow.start(request.headers.get('x-client-id') or (request.client and request.client.host))
+    if token is None:
+        body, headers = flow.busy_response()
+        return JSONResponse(body, status_code=429, headers=headers)
+    try:
+        recognized = await ingest.recognize(await upload.read())
+    finally:
+        flow.finish(token)
+    if recognized is None:
+        return JSONResponse({"status": "error", "message": "Invalid image", "flow": flow.advice()}, status_code=400)
+
+    _, matches = recognized
+    return JSONResponse({"status": "success", "name": routes.first_known_name(matches), "flow": flow.advice()})
+
+
+async def receive_faces(request):
+    """Async counterpart of app.routes.receive_faces with the same form fields and responses."""
+    form = await request.form(max_files=config.MAX_FACE_CHIPS + 1)
+    chips = [chip for chip in form.getlist('face') if not isinstance(chip, str)]
+    if not chips:
+        return JSONResponse({"status": "error", "message": "No face chips received"}, status_code=400)
+    if len(chips) > config.MAX_FACE_CHIPS:
+        return JSONResponse({"status": "error", "message": f"At most {config.MAX_FACE_CHIPS} face chips per request"},
+                            status_code=400)
+
+    token = flow.start(request.headers.get('x-client-id') or (request.client and request.client.host))
+    if token is None:
+        body, headers = flow.busy_response()
+        return JSONResponse(body, status_code=429, headers=headers)
+    try:
+        try:
+            boxes = parse_boxes(form.get('boxes'), len(chips))
+            padding = parse_padding(form.get('padding'))
+            data = [await chip.read() for chip in chips]
+            decoded = await asyncio.get_running_loop().run_in_executor(None, decode_chips, data, padding)
+        except ValueError as e:
+            return JSONResponse({"status": "error", "message": str(e), "flow": flow.advice()}, status_code=400)
+        matches = await ingest.recognize_chips(decoded)
+    finally:
+        flow.finish(token)
+
+    return JSONResponse({"status": "success", "name": routes.first_known_name(matches),
+                         "faces": routes.face_results(boxes, matches, scale=1.0), "flow": flow.advice()})
+
+
+async def frames_socket(websocket):
+    """Binary WebSocket channel: each message is one JPEG frame, each reply a JSON result.
+
+    Replies look like the /receive_frame ones plus "faces" (box, name and
+    distance per face). Clients send their next frame after the reply, so
+    there is never more than one frame per connection in progress.
+    """
+    await websocket.accept()
+    client_id = websocket.headers.get('x-client-id') or f'ws-{id(websocket)}'
+    try:
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+            data = message.get('bytes')
+            if not data:
+                continue
+            token = flow.start(client_id)
+            if token is None:
+                body, _ = flow.busy_response()
+                await websocket.send_json(body)
+                continue
+            try:
+                recognized = await ingest.recognize(data)
+            finally:
+                flow.finish(token)
+            if recognized is None:
+                await websocket.send_json({"status": "error", "message": "Invalid image", "flow": flow.advice()})
+                continue
+            locations, matches = recognized
+            await websocket.send_json({"status": "success", "name": routes.first_known_name(matches),
+                                       "faces": routes.face_results(locations, matches), "flow": flow.advice()})
+    except WebSocketDisconnect:
+        pass
+
+
+async def ingest_stats(request):
+    return JSONResponse({"flow": flow.stats(), **ingest.stats()})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    ingest.start()
+    logger.info("Frame ingestion using %d worker processes.", ingest.workers)
+    try:
+        yield
+    finally:
+        ingest.stop()
+
+
+app = Starlette(
+    routes=[
+        Route('/receive_frame', receive_frame, methods=['POST']),
+        Route('/receive_faces', receive_faces, methods=['POST']),
+        WebSocketRoute('/ws/frames', frames_socket),
+        Route('/ingest/stats', ingest_stats, methods=['GET']),
+        Mount('/', app=WSGIMiddleware(routes.app)),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(app, host='0.0.0.0', port=5000)
@@ -0,0 +1,280 @@
+"""Attendance bookkeeping and write-behind persistence of sightings."""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+# Someone unseen for longer than this is marked as having left (discipline_status = 0)
+ABSENCE_MINUTES = 30
+
+INSERT_SQL = ("INSERT INTO attendance2 (name, entry_time, last_seen_time, discipline_status, working_hours) "
+              "VALUES (%s, %s, %s, %s, %s)")
+ABSENT_SQL = "UPDATE attendance2 SET discipline_status = 0 WHERE name = %s"
+HOURS_SQL = "UPDATE attendance2 SET working_hours = %s WHERE name = %s"
+
+
+def record_sighting(attendance_data, name, current_time):
+    """Apply one sighting to the in-memory attendance and return the DB change.
+
+    The change is ('insert', row), ('absent', None) or ('hours', working_hours).
+    """
+    if name not in attendance_data:
+        attendance_data[name] = {
+            'entry_time': current_time,
+            'last_seen_time': current_time,
+            'discipline_status': 1,
+            'working_hours': 0
+        }
+        return 'insert', [name, current_time, current_time, 1, 0]
+
+    record = attendance_data[name]
+    last_seen = record['last_seen_time']
+    record['last_seen_time'] = current_time
+    if (current_time - last_seen).total_seconds() / 60.0 > ABSENCE_MINUTES:
+        record['discipline_status'] = 0
+        return 'absent', None
+
+    record['discipline_status'] = 1
+    working_hours = (current_time - record['entry_time']).total_seconds() / 3600.0
+    record['working_hours'] = working_hours
+    return 'hours', working_hours
+
+
+class AttendanceState:
+    """Thread-safe attendance records with a monotonically increasing version.
+
+    Every change bumps `version` and moves the record to the end of a
+    change log, so changes since a given version are read from the tail
+    without scanning everyone. The lock is only held for dict updates and
+    shallow copies; JSON encoding happens outside it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+        self._changed = OrderedDict()
+        self._reset_version = 0
+        self._full_body = (None, None)
+        self.version = 0
+
+    def record(self, name, current_time):
+        """Apply a sighting (see record_sighting) and return its DB change."""
+        with self._lock:
+            change = record_sighting(self._records, name, current_time)
+            self.version += 1
+            self._changed[name] = self.version
+            self._changed.move_to_end(name)
+            return change
+
+    def snapshot(self, since=None):
+        """Return (version, full, records).
+
+        With `since`, only records changed after that version are returned,
+        unless a reset happened since then; `full` tells the client to drop
+        what it has and replace it with `records`.
+        """
+        with self._lock:
+            version = self.version
+            if since is None or since < self._reset_version or since > version:
+                return version, True, {name: dict(r) for name, r in self._records.items()}
+            changes = {}
+            for name in reversed(self._changed):
+                if self._changed[name] <= since:
+                    break
+                changes[name] = dict(self._records[name])
+            return version, False, changes
+
+    def full_json(self):
+        """Return (version, JSON body) of every record, encoded once per version."""
+        version, body = self._full_body
+        if version == self.version:
+            return version, body
+        version, _, records = self.snapshot()
+        body = jsonify(records).get_data()
+        self._full_body = (version, body)
+        return version, body
+
+    def reset(self):
+        with self._lock:
+            self._records = {}
+            self._changed = OrderedDict()
+            self.version += 1
+            self._reset_version = self.version
+
+    def __len__(self):
+        return len(self._records)
+
+
+def attendance_response(state):
+    """Serve GET /attendance[?since=<version>] with ETag / 304 handling.
+
+    Without `since` the body is the full {name: record} map, as before.
+    With it, the body is {"version", "full", "records"} holding only what
+    changed after that version.
+    """
+    current = str(state.version)
+    if request.if_none_match.contains(current):
+        response = Response(status=304)
+        response.set_etag(current)
+        return response
+
+    since = request.args.get('since', type=int)
+    if since is None:
+        version, body = state.full_json()
+        response = Response(body, mimetype='application/json')
+    else:
+        version, full, records = state.snapshot(since)
+        response = jsonify({"version": version, "full": full, "records": records})
+    response.set_etag(str(version))
+    return response
+
+
+class AttendanceWriter:
+    """Coalesces attendance changes per person and writes them on a background thread.
+
+    submit() never touches the database: it merges the change into the
+    pending state for that person, so a person seen 30 times a second costs
+    one row per flush. Every `window` seconds the pending changes are
+    written with executemany in a single transaction. Once `max_pending`
+    people are pending, updates for further names are dropped and counted
+    so a stalled database cannot grow memory without bound. Inserts are
+    always kept: later sightings only update that person's row, so a lost
+    insert would lose their whole day.
+    `storage` is an app.storage backend. With a `rollup` (app.reports.DailyRollup),
+    the per-day aggregates are upserted in the same transaction.
+    """
+
+    def __init__(self, storage, window=1.0, max_pending=10000, rollup=None):
+        self.storage = storage
+        self.rollup = rollup
+        self.window = window
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+
+        self.submitted = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.errors = 0
+        self.last_flush_ms = None
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, name, change, seen_at=None):
+        """Queue a change returned by record_sighting() for `name`, seen at `seen_at`."""
+        kind, value = change
+        if self.rollup is not None and seen_at is not None:
+            self.rollup.add(name, seen_at)
+        with self._lock:
+            self.submitted += 1
+            pending = self._pending.get(name)
+            if pending is None:
+                if len(self._pending) >= self.max_pending and kind != 'insert':
+                    self.dropped += 1
+                    return False
+                pending = self._pending[name] = {'insert': None, 'absent': False, 'hours': None}
+            self._merge(pending, kind, value)
+        return True
+
+    @staticmethod
+    def _merge(pending, kind, value):
+        if kind == 'insert':
+            pending.update(insert=list(value), absent=False, hours=None)
+        elif kind == 'absent':
+            if pending['insert'] is not None:
+                pending['insert'][3] = 0
+            else:
+                pending['absent'] = True
+        elif pending['insert'] is not None:
+            pending['insert'][4] = value
+        else:
+            pending['hours'] = value
+
+    def _run(self):
+        while not self._stop.wait(self.window):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """Write everything pending in one transaction; on failure it is retried next flush."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        daily = self.rollup.take() if self.rollup is not None else {}
+        if not batch and not daily:
+            return
+
+        inserts = [p['insert'] for p in batch.values() if p['insert'] is not None]
+        absent = [(name,) for name, p in batch.items() if p['absent']]
+        hours = [(p['hours'], name) for name, p in batch.items() if p['hours'] is not None]
+        started = time.monotonic()
+        try:
+            with self.storage.transaction() as cursor:
+                if inserts:
+                    cursor.executemany(INSERT_SQL, inserts)
+                if absent:
+                    cursor.executemany(ABSENT_SQL, absent)
+                if hours:
+                    cursor.executemany(HOURS_SQL, hours)
+                if daily:
+                    self.rollup.write(cursor, daily)
+        except Exception as e:
+            self.errors += 1
+            logger.error("Attendance flush of %d people failed: %s", len(batch), e)
+            self._requeue(batch)
+            if daily:
+                self.rollup.requeue(daily)
+            return
+
+        self.flushes += 1
+        self.rows_written += len(inserts) + len(absent) + len(hours) + len(daily)
+        self.last_flush_ms = round((time.monotonic() - started) * 1000, 1)
+
+    def _requeue(self, batch):
+        """Put a failed batch back underneath anything submitted since."""
+        with self._lock:
+            for name, old in batch.items():
+                newer = self._pending.get(name)
+                if newer is None:
+                    self._pending[name] = old
+                    continue
+                if newer['insert'] is None and old['insert'] is not None:
+                    newer['insert'] = old['insert']
+                    if newer['absent']:
+                        newer['insert'][3] = 0
+                    if newer['hours'] is not None:
+                        newer['insert'][4] = newer['hours']
+                    newer['absent'], newer['hours'] = False, None
+                elif newer['insert'] is None:
+                    newer['absent'] = newer['absent'] or old['absent']
+                    if newer['hours'] is None:
+                        newer['hours'] = old['hours']
+
+    def stop(self):
+        """Flush what is pending and stop the writer thread."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        else:
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "errors": self.errors,
+            "last_flush_ms": self.last_flush_ms,
+        }
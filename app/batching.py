@@ -0,0 +1,130 @@
+"""Encoding and matching of faces from concurrent requests in shared batches."""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import dlib
+import numpy as np
+from face_recognition import api as face_api
+
+logger = logging.getLogger(__name__)
+
+
+def encode_faces(images, locations, num_jitters=1):
+    """face_encodings() for several images with a single dlib descriptor call.
+
+    `locations` holds the face locations of each image; returns one list of
+    128-d encodings per image, in the same order.
+    """
+    shapes = []
+    for img, locs in zip(images, locations):
+        detections = dlib.full_object_detections()
+        for shape in face_api._raw_face_landmarks(img, locs, model='small'):
+            detections.append(shape)
+        shapes.append(detections)
+    descriptors = face_api.face_encoder.compute_face_descriptor(list(images), shapes, num_jitters)
+    return [[np.array(d, dtype=np.float32) for d in per_image] for per_image in descriptors]
+
+
+class BatchEncoder:
+    """Collects faces from concurrent callers and encodes and matches them together.
+
+    submit() returns a Future resolving to one (name, distance) per face
+    location. A batch is closed when it holds `max_faces` faces or
+    `max_wait` seconds after its first frame arrived, then landmarked,
+    encoded and matched in one go. `encode` has encode_faces()'s signature
+    and lets the batch run elsewhere (e.g. a process pool); each of the
+    `threads` threads runs one batch at a time. Faces are matched against
+    `get_matcher()` as of when their batch runs.
+    """
+
+    def __init__(self, get_matcher, max_faces=16, max_wait=0.005, threads=1, encode=encode_faces):
+        self.get_matcher = get_matcher
+        self.max_faces = max_faces
+        self.max_wait = max_wait
+        self.encode = encode
+        self._queue = queue.Queue()
+        self._threads = [threading.Thread(target=self._run, name=f'batch-encoder-{i}', daemon=True)
+                         for i in range(threads)]
+
+        self.batches = 0
+        self.faces = 0
+        self.errors = 0
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def submit(self, image, locations):
+        future = Future()
+        if not locations:
+            future.set_result([])
+        else:
+            self._queue.put((image, locations, future))
+        return future
+
+    def _collect(self):
+        """Block for the first frame, then gather more until the batch is full or due."""
+        first = self._queue.get()
+        if first is None:
+            self._queue.put(None)
+            return None
+        batch, faces = [first], len(first[1])
+        deadline = time.monotonic() + self.max_wait
+        while faces < self.max_faces:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+            faces += len(item[1])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        try:
+            encodings = self.encode([image for image, _, _ in batch], [locs for _, locs, _ in batch])
+            matches = self.get_matcher().identify([e for per_image in encodings for e in per_image])
+        except Exception as e:
+            self.errors += 1
+            logger.error("Encoding a batch of %d frames failed: %s", len(batch), e)
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        start = 0
+        for (_, _, future), per_image in zip(batch, encodings):
+            future.set_result(matches[start:start + len(per_image)])
+            start += len(per_image)
+        self.faces += start
+
+    def stop(self):
+        self._queue.put(None)
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "faces": self.faces,
+            "mean_batch": round(self.faces / self.batches, 2) if self.batches else None,
+            "queued": self._queue.qsize(),
+            "errors": self.errors,
+        }
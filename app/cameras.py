@@ -0,0 +1,138 @@
+"""Registry of cameras, persisted to a JSON file and editable over HTTP."""
+import json
+import os
+import re
+import threading
+
+from flask import Blueprint, jsonify, request
+
+from . import config
+
+_ID_PATTERN = re.compile(r'^[\w.-]{1,64}$')
+
+
+def validate_camera(camera_id, data):
+    """Return a clean camera dict from user input; raises ValueError.
+
+    Keys: source (webcam index or stream URL), fps (cap on frames
+    recognized per second), enabled, width and height (frame size handed
+    to recognition, CAMERA_WIDTH x CAMERA_HEIGHT by default) and optional
+    motion (MotionGate settings).
+    """
+    if not _ID_PATTERN.match(camera_id):
+        raise ValueError("Camera id must be 1-64 letters, digits, '_', '.' or '-'")
+    if not isinstance(data, dict):
+        raise ValueError("Camera must be a JSON object")
+    source = data.get('source')
+    if isinstance(source, bool) or not isinstance(source, (int, str)) or source == '':
+        raise ValueError("source must be a webcam index or a stream URL")
+    fps = data.get('fps', 5)
+    if isinstance(fps, bool) or not isinstance(fps, (int, float)) or not 0 < fps <= 60:
+        raise ValueError("fps must be a number between 0 and 60")
+    size = {}
+    for key, default in (('width', config.CAMERA_WIDTH), ('height', config.CAMERA_HEIGHT)):
+        size[key] = data.get(key, default)
+        if isinstance(size[key], bool) or not isinstance(size[key], int) or not 16 <= size[key] <= 4096:
+            raise ValueError(f"{key} must be a whole number of pixels between 16 and 4096")
+    motion = data.get('motion', {})
+    if not isinstance(motion, dict):
+        raise ValueError("motion must be an object of MotionGate settings")
+    return {
+        'id': camera_id,
+        'source': source,
+        'fps': fps,
+        'enabled': bool(data.get('enabled', True)),
+        'width': size['width'],
+        'height': size['height'],
+        'motion': motion,
+    }
+
+
+class CameraRegistry:
+    """The cameras in `path` ({"cameras": [...]}), saved atomically on every change."""
+
+    def __init__(self, path=config.CAMERAS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cameras = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for camera in json.load(f).get('cameras', []):
+                    self._cameras[camera['id']] = validate_camera(camera['id'], camera)
+
+    def list(self):
+        with self._lock:
+            return [dict(camera) for camera in self._cameras.values()]
+
+    def enabled(self):
+        return [camera for camera in self.list() if camera['enabled']]
+
+    def get(self, camera_id):
+        with self._lock:
+            camera = self._cameras.get(camera_id)
+            return dict(camera) if camera is not None else None
+
+    def put(self, camera_id, data):
+        """Add or replace a camera; returns it."""
+        camera = validate_camera(camera_id, data)
+        with self._lock:
+            self._cameras[camera_id] = camera
+            self._save()
+        return dict(camera)
+
+    def remove(self, camera_id):
+        """Remove a camera; raises KeyError if it is not registered."""
+        with self._lock:
+            del self._cameras[camera_id]
+            self._save()
+
+    def _save(self):
+        tmp_file = f'{self.path}.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'cameras': list(self._cameras.values())}, f, indent=2)
+        os.replace(tmp_file, self.path)
+
+
+def cameras_blueprint(registry, scheduler):
+    """Blueprint with the camera registry API and per-camera health and results."""
+    bp = Blueprint('cameras', __name__, url_prefix='/cameras')
+
+    @bp.errorhandler(ValueError)
+    def bad_request(e):
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    @bp.route('', methods=['GET'])
+    def list_cameras():
+        """Every camera with its health."""
+        return jsonify({"cameras": [dict(camera, status=scheduler.camera_status(camera['id']))
+                                    for camera in registry.list()]})
+
+    @bp.route('/stats', methods=['GET'])
+    def stats():
+        """Worker processes, their cameras and the result queue."""
+        return jsonify(scheduler.stats())
+
+    @bp.route('/<camera_id>', methods=['GET'])
+    def get_camera(camera_id):
+        camera = registry.get(camera_id)
+        if camera is None:
+            return jsonify({"status": "error", "message": f"No camera {camera_id}"}), 404
+        return jsonify(dict(camera, status=scheduler.camera_status(camera_id, results=True)))
+
+    @bp.route('/<camera_id>', methods=['PUT'])
+    def put_camera(camera_id):
+        """Add or replace a camera from a JSON body; the scheduler picks it up right away."""
+        camera = registry.put(camera_id, request.get_json(silent=True))
+        scheduler.apply()
+        return jsonify({"status": "success", "camera": camera})
+
+    @bp.route('/<camera_id>', methods=['DELETE'])
+    def delete_camera(camera_id):
+        try:
+            registry.remove(camera_id)
+        except KeyError:
+            return jsonify({"status": "error", "message": f"No camera {camera_id}"}), 404
+        scheduler.apply()
+        return jsonify({"status": "success", "camera": camera_id})
+
+    return bp
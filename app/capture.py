@@ -0,0 +1,186 @@
+"""Background frame capture that always hands out the freshest frame."""
+import logging
+import os
+import threading
+import time
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# OpenCV reads FFmpeg options from the environment when a capture is opened
+_ffmpeg_env_lock = threading.Lock()
+
+
+class LatestFrameCapture:
+    """Reads a cv2.VideoCapture on its own thread into a one-slot buffer.
+
+    The recognizer never waits behind OpenCV's internal queue: read()
+    returns the newest frame, and frames it never got to are counted as
+    dropped. Call mark_result() once the output for the last frame read is
+    published to record capture-to-result latency.
+
+    The same frame object may be handed to several readers, so copy it
+    before drawing on it if anything else reads this capture. read() is
+    for a single consumer; any number of others can follow the capture
+    with read_latest() and their own sequence numbers.
+
+    With `reconnect`, a stream that fails to open or stops delivering is
+    reopened with exponential backoff (up to `max_backoff` seconds) until
+    release() instead of ending the capture. `ffmpeg_options` are passed
+    as OPENCV_FFMPEG_CAPTURE_OPTIONS ("key;value|key;value") and
+    `decode_threads` sets the decoder's thread count, for network streams.
+    """
+
+    def __init__(self, source, width=None, height=None, reconnect=False, ffmpeg_options=None,
+                 decode_threads=0, max_backoff=30.0):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.reconnect = reconnect
+        self.ffmpeg_options = ffmpeg_options
+        self.decode_threads = decode_threads
+        self.max_backoff = max_backoff
+        self.cap = self._open()
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._captured_at = 0.0
+        self._running = reconnect or self.cap.isOpened()
+        self._released = threading.Event()
+        self._last_seq = 0
+        self._last_captured_at = None
+
+        self.captured = 0
+        self.delivered = 0
+        self.reconnects = 0
+        self.latency = None
+        self.started_at = time.monotonic()
+
+        self._thread = threading.Thread(target=self._run, name=f'capture-{source}', daemon=True)
+        if self._running:
+            self._thread.start()
+
+    def _open(self):
+        if self.ffmpeg_options is None:
+            cap = cv2.VideoCapture(self.source)
+        else:
+            params = [cv2.CAP_PROP_N_THREADS, self.decode_threads] if self.decode_threads else []
+            with _ffmpeg_env_lock:
+                previous = os.environ.get('OPENCV_FFMPEG_CAPTURE_OPTIONS')
+                os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = self.ffmpeg_options
+                try:
+                    cap = cv2.VideoCapture(self.source, cv2.CAP_FFMPEG, params)
+                finally:
+                    if previous is None:
+                        del os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS']
+                    else:
+                        os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = previous
+        if self.width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        return cap
+
+    def isOpened(self):
+        return self._running
+
+    def _run(self):
+        backoff = 0.5
+        while self._running:
+            success, frame = self.cap.read() if self.cap.isOpened() else (False, None)
+            if not success:
+                if not self.reconnect or self._released.is_set():
+                    logger.warning("Capture from %s ended.", self.source)
+                    break
+                logger.warning("No frames from %s; reconnecting in %.1fs.", self.source, backoff)
+                self.cap.release()
+                if self._released.wait(backoff):
+                    break
+                backoff = min(backoff * 2, self.max_backoff)
+                self.cap = self._open()
+                self.reconnects += 1
+                continue
+            backoff = 0.5
+            with self._cond:
+                self._frame = frame
+                self._seq += 1
+                self._captured_at = time.monotonic()
+                self.captured += 1
+                self._cond.notify_all()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def read_latest(self, after=0, timeout=5.0):
+        """Wait for a frame newer than sequence number `after`.
+
+        Returns (seq, frame, captured_at); frame is None if the capture
+        stopped or nothing new arrived within `timeout` seconds.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after or not self._running, timeout):
+                return after, None, None
+            if self._seq <= after:
+                return after, None, None
+            return self._seq, self._frame, self._captured_at
+
+    def read(self, timeout=5.0):
+        """cv2.VideoCapture-style read of the newest frame not yet returned."""
+        seq, frame, captured_at = self.read_latest(self._last_seq, timeout)
+        if frame is None:
+            return False, None
+        self.delivered += 1
+        self._last_seq = seq
+        self._last_captured_at = captured_at
+        return True, frame
+
+    def mark_result(self):
+        """Record that the result for the last frame read has been published."""
+        if self._last_captured_at is None:
+            return
+        latency = time.monotonic() - self._last_captured_at
+        self.latency = latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+
+    @property
+    def dropped(self):
+        return max(0, self.captured - self.delivered)
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        return {
+            "source": str(self.source),
+            "running": self._running,
+            "captured": self.captured,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+            "capture_fps": round(self.captured / elapsed, 1),
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+        }
+
+    def release(self):
+        self._running = False
+        self._released.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self.cap.release()
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_capture(source, **kwargs):
+    """The one LatestFrameCapture for `source` in this process, opened on first use.
+
+    Every consumer of a stream should go through this, so the stream is
+    received and decoded once however many consumers there are. `kwargs`
+    only apply when the capture is first opened.
+    """
+    with _shared_lock:
+        capture = _shared.get(source)
+        if capture is None or not capture.isOpened():
+            capture = _shared[source] = LatestFrameCapture(source, **kwargs)
+        return capture
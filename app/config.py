@@ -0,0 +1,77 @@
+import json
+import os
+
+# Gallery of enrolled faces
+GALLERY_PATH = os.getenv('GALLERY_PATH', 'lib/attendance')
+
+# Nearest-neighbour search over the gallery: 'exact', 'ivf' or 'faiss'
+FACE_INDEX = os.getenv('FACE_INDEX', 'exact')
+# Galleries smaller than this are always searched exactly
+FACE_INDEX_MIN_SIZE = int(os.getenv('FACE_INDEX_MIN_SIZE', '5000'))
+# Number of IVF lists probed per query (higher = better recall, slower)
+FACE_INDEX_NPROBE = int(os.getenv('FACE_INDEX_NPROBE', '16'))
+
+# Per-camera motion gate settings, keyed by camera source, e.g.
+# CAMERA_MOTION='{"0": {"threshold": 30, "min_area": 0.005}}'
+# See app.motion.MotionGate for the available keys.
+CAMERA_MOTION = json.loads(os.getenv('CAMERA_MOTION', '{}'))
+
+# Attendance database: 'mysql' or 'sqlite' (local WAL file, no server needed)
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql')
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'attendance.db')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+
+# Async ingestion service (app.asgi): recognition worker processes (0 = one per CPU),
+# frames being recognized at once (0 = twice the workers) and frames allowed to
+# wait for a slot before new ones are turned away with 429
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '0')) or os.cpu_count() or 1
+INGEST_MAX_INFLIGHT = int(os.getenv('INGEST_MAX_INFLIGHT', '0')) or 2 * INGEST_WORKERS
+INGEST_MAX_WAITING = int(os.getenv('INGEST_MAX_WAITING', '256'))
+
+# Faces from concurrent /receive_frame requests are encoded and matched together:
+# a batch closes at this many faces or this many milliseconds after its first frame
+ENCODE_BATCH_FACES = int(os.getenv('ENCODE_BATCH_FACES', '16'))
+ENCODE_BATCH_WAIT_MS = float(os.getenv('ENCODE_BATCH_WAIT_MS', '5'))
+
+# Threads of the waitress server started by run.py
+WSGI_THREADS = int(os.getenv('WSGI_THREADS', '8'))
+
+# Flow control for /receive_frame clients: frames the Flask route handles at once
+# and the range of frame rates advertised. Keep it below WSGI_THREADS: frames over
+# the limit must reach Flask to get their 429, not wait in the server's own queue.
+RECEIVE_MAX_INFLIGHT = int(os.getenv('RECEIVE_MAX_INFLIGHT', '0')) or max(1, WSGI_THREADS // 2)
+STREAM_MIN_FPS = float(os.getenv('STREAM_MIN_FPS', '1'))
+STREAM_MAX_FPS = float(os.getenv('STREAM_MAX_FPS', '15'))
+
+# Most face chips accepted in one /receive_faces request
+MAX_FACE_CHIPS = int(os.getenv('MAX_FACE_CHIPS', '16'))
+
+# Edge timestamps further than this many seconds from the server clock are
+# replaced by the arrival time when recording attendance
+EMBEDDING_MAX_SKEW = float(os.getenv('EMBEDDING_MAX_SKEW', '300'))
+
+# FFmpeg options for network camera streams (OPENCV_FFMPEG_CAPTURE_OPTIONS format):
+# no demuxer buffering, low-delay decoding, short probing, tolerate bursts and give
+# up on a silent stream after 5 s so the capture can reconnect
+STREAM_FFMPEG_OPTIONS = os.getenv(
+    'STREAM_FFMPEG_OPTIONS',
+    'fflags;nobuffer|flags;low_delay|probesize;500000|analyzeduration;1000000'
+    '|overrun_nonfatal;1|fifo_size;50000|timeout;5000000')
+# Decoder threads per stream (0 = OpenCV's default)
+STREAM_DECODE_THREADS = int(os.getenv('STREAM_DECODE_THREADS', '2'))
+
+# /monitoring preview: width in pixels (0 = camera size), frame rate cap and JPEG quality
+MONITOR_WIDTH = int(os.getenv('MONITOR_WIDTH', '640'))
+MONITOR_FPS = float(os.getenv('MONITOR_FPS', '10'))
+MONITOR_QUALITY = int(os.getenv('MONITOR_QUALITY', '80'))
+
+# MJPEG /stream output ladder as "width:quality,..." e.g. "1280:80,640:70,320:50";
+# empty = 1280/640/320 derived from each script's quality
+STREAM_LADDER = os.getenv('STREAM_LADDER', '')
+
+# Multi-camera service (multicam.py): camera registry file and worker processes (0 = one per CPU)
+CAMERAS_FILE = os.getenv('CAMERAS_FILE', 'cameras.json')
+CAMERA_WORKERS = int(os.getenv('CAMERA_WORKERS', '0')) or os.cpu_count() or 1
+# Default frame size capture processes hand to recognition workers; frames of other sizes are resized
+CAMERA_WIDTH = int(os.getenv('CAMERA_WIDTH', '1280'))
+CAMERA_HEIGHT = int(os.getenv('CAMERA_HEIGHT', '720'))
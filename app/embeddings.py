@@ -0,0 +1,81 @@
+"""Binary wire format for face embeddings computed on edge devices.
+
+A message is a little-endian header followed by three arrays:
+
+    magic       4 bytes   b'FEMB'
+    version     uint8     1
+    dtype       uint8     1 = float32, 2 = float16
+    count       uint16    number of faces
+    dim         uint16    embedding size (128)
+    id_length   uint16    bytes of camera id
+    timestamp   float64   capture time, seconds since the epoch
+    camera id   id_length bytes of UTF-8
+    boxes       count x 4 int32 (top, right, bottom, left) in camera pixels
+    embeddings  count x dim of dtype
+
+128 float16 values are 256 bytes per face, against a video stream's
+megabits per second.
+"""
+import math
+import struct
+
+import numpy as np
+
+MAGIC = b'FEMB'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHHHd')
+DTYPES = {1: np.dtype('<f4'), 2: np.dtype('<f2')}
+DTYPE_CODES = {'float32': 1, 'float16': 2}
+MAX_FACES = 256
+# Timestamps must fall between the epoch and the end of year 9999, where datetime stops
+MAX_TIMESTAMP = 253402300800.0
+
+
+def pack_embeddings(camera_id, timestamp, boxes, encodings, dtype='float32', dim=128):
+    """Serialize one batch of faces from `camera_id` captured at `timestamp`."""
+    code = DTYPE_CODES[dtype]
+    encodings = np.asarray(encodings, dtype=DTYPES[code]).reshape(-1, dim)
+    if len(encodings) != len(boxes):
+        raise ValueError("Need one box per embedding")
+    camera = str(camera_id).encode('utf-8')
+    header = HEADER.pack(MAGIC, VERSION, code, len(boxes), encodings.shape[1], len(camera), timestamp)
+    return header + camera + np.asarray(boxes, dtype='<i4').reshape(-1, 4).tobytes() + encodings.tobytes()
+
+
+def unpack_embeddings(data, dim=128):
+    """Parse a message; returns (camera_id, timestamp, boxes (N, 4) int, encodings (N, dim) float32).
+
+    Raises ValueError for anything malformed.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Message too short")
+    magic, version, code, count, message_dim, id_length, timestamp = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not an embeddings message")
+    if version != VERSION:
+        raise ValueError(f"Unsupported version {version}")
+    if code not in DTYPES:
+        raise ValueError(f"Unknown dtype {code}")
+    if message_dim != dim:
+        raise ValueError(f"Expected {dim}-d embeddings, got {message_dim}")
+    if count > MAX_FACES:
+        raise ValueError(f"At most {MAX_FACES} faces per message")
+    if not (math.isfinite(timestamp) and 0 <= timestamp < MAX_TIMESTAMP):
+        raise ValueError("Timestamp must be seconds since the epoch")
+
+    dtype = DTYPES[code]
+    offset = HEADER.size + id_length
+    boxes_size = count * 4 * 4
+    if len(data) != offset + boxes_size + count * dim * dtype.itemsize:
+        raise ValueError("Message length does not match its header")
+    try:
+        camera_id = bytes(data[HEADER.size:offset]).decode('utf-8')
+    except UnicodeDecodeError:
+        raise ValueError("Camera id is not UTF-8") from None
+
+    boxes = np.frombuffer(data, '<i4', count * 4, offset).reshape(count, 4)
+    encodings = np.frombuffer(data, dtype, count * dim, offset + boxes_size).reshape(count, dim)
+    encodings = encodings.astype(np.float32)
+    if not np.isfinite(encodings).all():
+        raise ValueError("Embeddings must be finite")
+    return camera_id, timestamp, boxes.astype(int), encodings
@@ -0,0 +1,83 @@
+"""Admission control and frame-rate advice for clients streaming to /receive_frame."""
+import math
+import threading
+import time
+
+
+class FlowController:
+    """Decides whether a frame may be processed now and how fast clients should send.
+
+    At most `limit` frames are handled at once; beyond that start() refuses
+    and the client is told when to retry. The advertised rate splits the
+    measured capacity (`capacity` parallel workers over the mean time a
+    frame takes) evenly between clients seen in the last `window` seconds,
+    clamped to [min_fps, max_fps]. Each client should keep at most
+    `max_inflight` frames outstanding.
+    """
+
+    def __init__(self, capacity, limit, min_fps=1.0, max_fps=15.0, window=5.0, max_inflight=1):
+        self.capacity = capacity
+        self.limit = limit
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.window = window
+        self.max_inflight = max_inflight
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._pruned_at = 0.0
+        self._service_time = None
+
+        self.inflight = 0
+        self.accepted = 0
+        self.throttled = 0
+
+    def start(self, client_id):
+        """Admit one frame from `client_id`; returns a token for finish(), or None if saturated."""
+        now = time.monotonic()
+        with self._lock:
+            self._clients[client_id] = now
+            if now - self._pruned_at > 1.0:
+                self._clients = {c: seen for c, seen in self._clients.items() if now - seen <= self.window}
+                self._pruned_at = now
+            if self.inflight >= self.limit:
+                self.throttled += 1
+                return None
+            self.inflight += 1
+            self.accepted += 1
+        return now
+
+    def finish(self, token):
+        elapsed = time.monotonic() - token
+        with self._lock:
+            self.inflight -= 1
+            self._service_time = elapsed if self._service_time is None else 0.9 * self._service_time + 0.1 * elapsed
+
+    def target_fps(self):
+        if self._service_time is None:
+            return self.max_fps
+        fps = self.capacity / (self._service_time * max(1, len(self._clients)))
+        return min(self.max_fps, max(self.min_fps, fps))
+
+    def retry_after(self):
+        """Seconds a refused client should wait before its next frame."""
+        return 1.0 / self.target_fps()
+
+    def advice(self):
+        return {"fps": round(self.target_fps(), 2), "max_inflight": self.max_inflight}
+
+    def busy_response(self):
+        """(body, headers) for a 429 reply."""
+        retry = self.retry_after()
+        body = {"status": "error", "message": "Server is busy", "retry_after_ms": round(retry * 1000),
+                "flow": self.advice()}
+        return body, {"Retry-After": str(max(1, math.ceil(retry)))}
+
+    def stats(self):
+        return {
+            "clients": len(self._clients),
+            "inflight": self.inflight,
+            "accepted": self.accepted,
+            "throttled": self.throttled,
+            "service_ms": None if self._service_time is None else round(self._service_time * 1000, 1),
+            "target_fps": round(self.target_fps(), 2),
+        }
@@ -0,0 +1,147 @@
+"""Shared-memory ring of frames for handing frames between processes without pickling."""
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _attach(name):
+    try:
+        # Python 3.13+: attaching must not make this process's tracker unlink the block
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class FrameRing:
+    """Fixed slots of one frame shape in shared memory, one writer and any number of readers.
+
+    The writer copies each frame into a free slot and stamps it with the
+    next sequence number. read_latest() hands out a numpy view of the
+    newest slot, not a copy, and pins it: the writer never reuses a pinned
+    slot, so the view stays valid until release(seq). With `slots` at
+    least readers + 2 the writer always has somewhere to write; otherwise
+    the frame is dropped and counted.
+
+    The ring is created by one process and passed to others as a Process
+    argument; unpickling attaches to the same memory. The creator calls
+    unlink() once every process is done with it.
+    """
+
+    def __init__(self, shape, slots=4, dtype=np.uint8, ctx=None):
+        ctx = ctx or multiprocessing.get_context('spawn')
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.dtype = np.dtype(dtype)
+        self._cond = ctx.Condition()
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=self._header_bytes() + slots * frame_bytes)
+        self._owner = True
+        self._map()
+        self._seqs[:] = 0
+        self._pins[:] = 0
+        self._counters[:] = 0
+
+    def _header_bytes(self):
+        # Per slot: sequence number, pin count and capture time; then written and dropped counters
+        return (3 * self.slots + 2) * 8
+
+    def _map(self):
+        buf = self._shm.buf
+        n = self.slots
+        self._seqs = np.ndarray((n,), np.int64, buf, 0)
+        self._pins = np.ndarray((n,), np.int64, buf, 8 * n)
+        self._times = np.ndarray((n,), np.float64, buf, 16 * n)
+        self._counters = np.ndarray((2,), np.int64, buf, 24 * n)
+        self._frames = np.ndarray((n,) + self.shape, self.dtype, buf, self._header_bytes())
+
+    def __getstate__(self):
+        return {'name': self._shm.name, 'shape': self.shape, 'slots': self.slots,
+                'dtype': self.dtype.str, 'cond': self._cond}
+
+    def __setstate__(self, state):
+        self.shape = state['shape']
+        self.slots = state['slots']
+        self.dtype = np.dtype(state['dtype'])
+        self._cond = state['cond']
+        self._shm = _attach(state['name'])
+        self._owner = False
+        self._map()
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def write(self, frame, captured_at=None):
+        """Copy `frame` into the ring; returns its sequence number, or None if every slot is pinned."""
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match the ring's {self.shape}")
+        if captured_at is None:
+            captured_at = time.monotonic()
+        with self._cond:
+            newest = int(self._seqs.argmax())
+            free = [i for i in range(self.slots) if self._pins[i] == 0 and i != newest]
+            if not free:
+                self._counters[1] += 1
+                return None
+            slot = min(free, key=lambda i: self._seqs[i])
+            # Zero marks the slot as being written, so readers skip it
+            self._seqs[slot] = 0
+        np.copyto(self._frames[slot], frame)
+        with self._cond:
+            self._counters[0] += 1
+            seq = int(self._counters[0])
+            self._times[slot] = captured_at
+            self._seqs[slot] = seq
+            self._cond.notify_all()
+        return seq
+
+    def read_latest(self, after=0, timeout=5.0):
+        """Wait for a frame newer than sequence number `after` and pin it.
+
+        Returns (seq, frame, captured_at) where frame is a read-only view
+        into shared memory; call release(seq) when done with it. frame is
+        None if nothing new arrived within `timeout` seconds.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seqs.max() > after, timeout):
+                return after, None, None
+            slot = int(self._seqs.argmax())
+            self._pins[slot] += 1
+            seq = int(self._seqs[slot])
+            captured_at = float(self._times[slot])
+        frame = self._frames[slot]
+        frame.flags.writeable = False
+        return seq, frame, captured_at
+
+    def release(self, seq):
+        """Unpin the frame read as `seq`."""
+        with self._cond:
+            slots = np.flatnonzero(self._seqs == seq)
+            if len(slots) and self._pins[slots[0]] > 0:
+                self._pins[slots[0]] -= 1
+
+    def clear_pins(self):
+        """Unpin every slot, e.g. after a reader died holding one; no reader may be running."""
+        with self._cond:
+            self._pins[:] = 0
+
+    def stats(self):
+        with self._cond:
+            return {
+                "slots": self.slots,
+                "written": int(self._counters[0]),
+                "dropped": int(self._counters[1]),
+                "pinned": int((self._pins > 0).sum()),
+            }
+
+    def close(self):
+        """Detach this process; views handed out become invalid."""
+        self._seqs = self._pins = self._times = self._counters = self._frames = None
+        self._shm.close()
+
+    def unlink(self):
+        """Free the shared memory; only the creating process should call this."""
+        if self._owner:
+            self._shm.unlink()
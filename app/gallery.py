@@ -0,0 +1,299 @@
+"""On-disk encoding cache for the enrolled faces gallery."""
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+import face_recognition
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+ENCODING_SIZE = 128
+
+# Serializes read-modify-write of the cache by live enrollment
+_cache_lock = threading.Lock()
+
+
+def cache_path_for(path):
+    """Return the cache file that sits next to a gallery directory."""
+    return os.path.normpath(path) + '.npz'
+
+
+def file_digest(filepath):
+    """SHA-1 of a file's contents, used when size matches but mtime moved."""
+    digest = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_file(filepath):
+    """Decode one gallery image and return (encoding, error).
+
+    Only the 128-d float32 encoding leaves this function; the decoded pixels
+    are dropped before it returns, so a worker holds one image at a time.
+    """
+    return encode_image(cv2.imread(filepath), filepath)
+
+
+def encode_image(img, label='image'):
+    """Return (encoding, error) for a decoded BGR image."""
+    if img is None:
+        return None, 'unreadable image'
+    encodings = face_recognition.face_encodings(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    del img
+    if not encodings:
+        return None, 'no face found'
+    if len(encodings) > 1:
+        logger.warning("%s has %d faces, using the first one.", label, len(encodings))
+    return encodings[0].astype(np.float32), None
+
+
+def _encode_safely(filepath):
+    try:
+        return encode_file(filepath)
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+
+
+def enroll_files(filepaths, workers=None):
+    """Yield (filepath, encoding, error) for each file, encoding on all cores.
+
+    At most two files per worker are in flight, so peak memory depends on the
+    number of workers and not on the size of the gallery. Results are yielded
+    in completion order. Without fork support (Windows) the entry scripts
+    would be re-imported by every worker, so encoding stays in-process.
+    """
+    filepaths = list(filepaths)
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(filepaths))
+    if workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        for filepath in filepaths:
+            yield (filepath,) + _encode_safely(filepath)
+        return
+
+    pending = iter(filepaths)
+    in_flight = {}
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+        for filepath in pending:
+            in_flight[pool.submit(_encode_safely, filepath)] = filepath
+            if len(in_flight) >= workers * 2:
+                break
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                filepath = in_flight.pop(future)
+                next_path = next(pending, None)
+                if next_path is not None:
+                    in_flight[pool.submit(_encode_safely, next_path)] = next_path
+                yield (filepath,) + future.result()
+
+
+def read_cache(cache_file):
+    """Load cached entries as {filename: entry}; a missing or stale cache is empty."""
+    if not os.path.exists(cache_file):
+        return {}
+    try:
+        with np.load(cache_file, allow_pickle=False) as data:
+            if int(data['version']) != CACHE_VERSION:
+                logger.info("Gallery cache %s has an old format, rebuilding.", cache_file)
+                return {}
+            return {
+                str(filename): {
+                    'size': int(size),
+                    'mtime': int(mtime),
+                    'digest': str(digest),
+                    'valid': bool(valid),
+                    'error': str(error),
+                    'encoding': encoding,
+                }
+                for filename, size, mtime, digest, valid, error, encoding in zip(
+                    data['files'], data['sizes'], data['mtimes'],
+                    data['digests'], data['valid'], data['errors'], data['encodings'])
+            }
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning("Ignoring unreadable gallery cache %s: %s", cache_file, e)
+        return {}
+
+
+def write_cache(cache_file, entries):
+    """Atomically replace the cache file with the given entries."""
+    files = sorted(entries)
+    encodings = np.zeros((len(files), ENCODING_SIZE), dtype=np.float32)
+    for i, filename in enumerate(files):
+        if entries[filename]['valid']:
+            encodings[i] = entries[filename]['encoding']
+
+    tmp_file = f'{cache_file}.tmp'
+    with open(tmp_file, 'wb') as f:
+        np.savez(
+            f,
+            version=np.array(CACHE_VERSION),
+            files=np.array(files, dtype=str),
+            sizes=np.array([entries[n]['size'] for n in files], dtype=np.int64),
+            mtimes=np.array([entries[n]['mtime'] for n in files], dtype=np.int64),
+            digests=np.array([entries[n]['digest'] for n in files], dtype=str),
+            valid=np.array([entries[n]['valid'] for n in files], dtype=bool),
+            errors=np.array([entries[n]['error'] for n in files], dtype=str),
+            encodings=encodings,
+        )
+    os.replace(tmp_file, cache_file)
+
+
+def load_gallery(path='lib/attendance', cache_file=None, workers=None):
+    """Return (classNames, encodings) for every face in `path`.
+
+    Entries are keyed by file name, size and mtime; a file whose mtime changed
+    but whose contents hash the same is not re-encoded. Only new or changed
+    photos go through face_recognition, in parallel via enroll_files(), and
+    the cache is rewritten when anything differs from what was on disk.
+    Photos that cannot be enrolled are logged and left out of the result.
+    """
+    cache_file = cache_file or cache_path_for(path)
+    cached = read_cache(cache_file)
+    entries = {}
+    todo = {}
+    changed = False
+
+    for filename in sorted(os.listdir(path)):
+        filepath = os.path.join(path, filename)
+        # Hidden files and leftovers of interrupted writes are not people
+        if not os.path.isfile(filepath) or filename.startswith('.') or filename.endswith('.tmp'):
+            continue
+        st = os.stat(filepath)
+        entry = cached.get(filename)
+
+        if entry is not None and entry['size'] == st.st_size:
+            if entry['mtime'] == st.st_mtime_ns:
+                entries[filename] = entry
+                continue
+            digest = file_digest(filepath)
+            if entry['digest'] == digest:
+                entries[filename] = dict(entry, mtime=st.st_mtime_ns)
+                changed = True
+                continue
+        else:
+            digest = file_digest(filepath)
+        todo[filepath] = (filename, st, digest)
+
+    if todo:
+        logger.info("Encoding %d new or changed gallery photos...", len(todo))
+    for filepath, encoding, error in enroll_files(todo, workers):
+        filename, st, digest = todo[filepath]
+        if error:
+            logger.warning("Skipping %s: %s", filepath, error)
+        entries[filename] = {
+            'size': st.st_size,
+            'mtime': st.st_mtime_ns,
+            'digest': digest,
+            'valid': error is None,
+            'error': error or '',
+            'encoding': encoding,
+        }
+        changed = True
+
+    if changed or set(entries) != set(cached):
+        write_cache(cache_file, entries)
+        logger.info("Gallery cache %s updated.", cache_file)
+
+    failed = [filename for filename in entries if not entries[filename]['valid']]
+    if failed:
+        logger.warning("%d gallery photos could not be enrolled: %s", len(failed), ', '.join(sorted(failed)))
+    return _gallery_from_entries(entries)
+
+
+def _gallery_from_entries(entries):
+    valid = [filename for filename in sorted(entries) if entries[filename]['valid']]
+    classNames = [os.path.splitext(filename)[0] for filename in valid]
+    encodings = np.array([entries[filename]['encoding'] for filename in valid], dtype=np.float32)
+    return classNames, encodings.reshape(len(valid), ENCODING_SIZE)
+
+
+def _check_name(name):
+    if not name or name.startswith('.') or os.path.basename(name) != name:
+        raise ValueError(f"Invalid name {name!r}")
+
+
+def enroll_image(path, name, data, ext='.jpg', cache_file=None):
+    """Add or replace `name` in the gallery from encoded image bytes.
+
+    Only this image is encoded. The photo is written to `path` and its
+    entry to the cache, both atomically, and any previous photo with the
+    same name is replaced. Returns the updated (classNames, encodings).
+    Raises ValueError if the name is invalid or the image has no face.
+    """
+    _check_name(name)
+    encoding, error = encode_image(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR), name)
+    if error:
+        raise ValueError(f"Cannot enroll {name}: {error}")
+
+    cache_file = cache_file or cache_path_for(path)
+    filename = name + ext.lower()
+    filepath = os.path.join(path, filename)
+    with _cache_lock:
+        entries = read_cache(cache_file)
+        for other in _files_named(path, entries, name):
+            if other != filename:
+                _remove_file(path, other)
+                entries.pop(other, None)
+
+        # Written next to the gallery, not in it, so a crash cannot leave a photo-like file behind
+        fd, tmp_file = tempfile.mkstemp(suffix='.tmp', prefix=f'.{filename}.',
+                                        dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, filepath)
+        except BaseException:
+            os.remove(tmp_file)
+            raise
+        st = os.stat(filepath)
+        entries[filename] = {
+            'size': st.st_size,
+            'mtime': st.st_mtime_ns,
+            'digest': hashlib.sha1(data).hexdigest(),
+            'valid': True,
+            'error': '',
+            'encoding': encoding,
+        }
+        write_cache(cache_file, entries)
+        return _gallery_from_entries(entries)
+
+
+def remove_person(path, name, cache_file=None):
+    """Delete every photo of `name` from the gallery and the cache.
+
+    Returns the updated (classNames, encodings); raises KeyError if
+    nobody by that name is enrolled.
+    """
+    _check_name(name)
+    cache_file = cache_file or cache_path_for(path)
+    with _cache_lock:
+        entries = read_cache(cache_file)
+        filenames = _files_named(path, entries, name)
+        if not filenames:
+            raise KeyError(name)
+        for filename in filenames:
+            _remove_file(path, filename)
+            entries.pop(filename, None)
+        write_cache(cache_file, entries)
+        return _gallery_from_entries(entries)
+
+
+def _files_named(path, entries, name):
+    on_disk = [filename for filename in os.listdir(path) if os.path.isfile(os.path.join(path, filename))]
+    return sorted({filename for filename in list(entries) + on_disk if os.path.splitext(filename)[0] == name})
+
+
+def _remove_file(path, filename):
+    try:
+        os.remove(os.path.join(path, filename))
+    except FileNotFoundError:
+        pass
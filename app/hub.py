@@ -0,0 +1,75 @@
+"""Broadcast of the latest annotated frame to any number of viewers."""
+import threading
+import time
+
+from .ladder import RungSelector
+
+
+class FrameHub:
+    """Holds the newest published item and wakes every waiting subscriber.
+
+    Subscribers only ever get the latest item, so a slow client simply
+    skips frames; publishing never waits on a subscriber.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._seq = 0
+        self.closed = False
+        self.subscribers = 0
+
+    def publish(self, item):
+        with self._cond:
+            self._item = item
+            self._seq += 1
+            self._cond.notify_all()
+            return self._seq
+
+    def get(self, after=0, timeout=5.0):
+        """Wait for an item newer than `after`; returns (seq, item) or (after, None) on timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after or self.closed, timeout)
+            if self._seq <= after:
+                return after, None
+            return self._seq, self._item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+def mjpeg_stream(hub, rung=None):
+    """Yield multipart MJPEG parts for one viewer from a hub of LadderFrames.
+
+    Each viewer gets its own ladder rung, chosen from how long its parts
+    take to go out (the WSGI server blocks the yield once its buffers for
+    a slow client are full); `rung` pins it instead.
+    """
+    hub.subscribers += 1
+    try:
+        seq = 0
+        last_created = None
+        selector = None
+        while not hub.closed:
+            previous = seq
+            seq, frame = hub.get(seq)
+            if frame is None:
+                continue
+            if selector is None:
+                selector = RungSelector(frame.ladder.rungs, rung)
+            jpeg = frame.jpeg(selector.rung)
+
+            started = time.monotonic()
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+            send_time = time.monotonic() - started
+
+            skipped = seq - previous - 1 if previous else 0
+            if last_created is not None:
+                interval = (frame.created - last_created) / max(seq - previous, 1)
+                selector.update(len(jpeg), send_time, interval, skipped)
+            last_created = frame.created
+    finally:
+        hub.subscribers -= 1
@@ -0,0 +1,134 @@
+"""JPEG output ladder: each frame encoded at a few sizes/qualities, once, on demand."""
+import logging
+import threading
+import time
+
+import cv2
+
+from . import config
+
+try:
+    from turbojpeg import TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+logger = logging.getLogger(__name__)
+
+
+def parse_ladder(spec):
+    """Parse "1280:80,640:70,320:50" into [(width, quality)], best rung first."""
+    rungs = []
+    for part in spec.split(','):
+        width, quality = part.split(':')
+        rungs.append((int(width), int(quality)))
+    return sorted(rungs, key=lambda rung: (-rung[0], -rung[1]))
+
+
+class JpegLadder:
+    """Encodes frames at each rung's width and quality, with libjpeg-turbo when available.
+
+    Rungs are (width, quality) pairs, best first; frames narrower than a
+    rung are encoded at their own size.
+    """
+
+    def __init__(self, rungs, backend=None):
+        self.rungs = list(rungs)
+        self.encodes = [0] * len(self.rungs)
+        self._turbo = None
+        if backend in (None, 'turbojpeg') and TurboJPEG is not None:
+            try:
+                self._turbo = TurboJPEG()
+            except Exception as e:
+                logger.warning("libjpeg-turbo unavailable, encoding with OpenCV: %s", e)
+        if backend == 'turbojpeg' and self._turbo is None:
+            raise RuntimeError("The turbojpeg backend requires PyTurboJPEG and libjpeg-turbo")
+        self.backend = 'turbojpeg' if self._turbo is not None else 'opencv'
+
+    @classmethod
+    def with_quality(cls, quality):
+        """STREAM_LADDER if set, else 1280/640/320 rungs at up to `quality`."""
+        if config.STREAM_LADDER:
+            return cls(parse_ladder(config.STREAM_LADDER))
+        return cls([(1280, quality), (640, min(quality, 70)), (320, min(quality, 50))])
+
+    def __len__(self):
+        return len(self.rungs)
+
+    def encode(self, frame, rung):
+        width, quality = self.rungs[rung]
+        if frame.shape[1] > width:
+            scale = width / frame.shape[1]
+            frame = cv2.resize(frame, (0, 0), None, scale, scale, interpolation=cv2.INTER_AREA)
+        self.encodes[rung] += 1
+        if self._turbo is not None:
+            return self._turbo.encode(frame, quality=quality)
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes()
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "rungs": [{"width": w, "quality": q, "encodes": n} for (w, q), n in zip(self.rungs, self.encodes)],
+        }
+
+
+class LadderFrame:
+    """One annotated frame, published once; each rung is encoded by its first reader and cached."""
+
+    def __init__(self, frame, ladder):
+        self.frame = frame
+        self.ladder = ladder
+        self.created = time.monotonic()
+        self._jpegs = [None] * len(ladder)
+        self._locks = [threading.Lock() for _ in range(len(ladder))]
+
+    def jpeg(self, rung):
+        if self._jpegs[rung] is None:
+            with self._locks[rung]:
+                if self._jpegs[rung] is None:
+                    self._jpegs[rung] = self.ladder.encode(self.frame, rung)
+        return self._jpegs[rung]
+
+
+class RungSelector:
+    """Picks a ladder rung for one viewer from how fast its frames are being sent.
+
+    A frame that takes longer to send than the interval between frames, or
+    frames the viewer skipped, step down a rung. After `hold` frames in a
+    row that went out fine, it steps up if the measured throughput could
+    send the larger rung's frame in under `headroom` of the interval. With
+    `pinned`, the rung never changes.
+    """
+
+    def __init__(self, rungs, rung=None, hold=30, headroom=0.5):
+        self.rungs = rungs
+        self.pinned = rung is not None
+        self.rung = min(max(rung, 0), len(rungs) - 1) if self.pinned else min(1, len(rungs) - 1)
+        self.hold = hold
+        self.headroom = headroom
+        self._good = 0
+        self._interval = None
+        self._throughput = None
+
+    def update(self, nbytes, send_time, interval, skipped=0):
+        """Record one sent frame: its size, time spent sending it and the source frame interval."""
+        self._interval = interval if self._interval is None else 0.8 * self._interval + 0.2 * interval
+        throughput = nbytes / max(send_time, 1e-4)
+        self._throughput = throughput if self._throughput is None else 0.8 * self._throughput + 0.2 * throughput
+        if self.pinned:
+            return self.rung
+
+        if skipped or send_time > 0.9 * self._interval:
+            self._good = 0
+            if self.rung < len(self.rungs) - 1:
+                self.rung += 1
+            return self.rung
+
+        self._good += 1
+        if self._good >= self.hold and self.rung > 0:
+            self._good = 0
+            # JPEG size grows roughly with the pixel count
+            larger = nbytes * (self.rungs[self.rung - 1][0] / self.rungs[self.rung][0]) ** 2
+            if larger / self._throughput < self.headroom * self._interval:
+                self.rung -= 1
+        return self.rung
@@ -0,0 +1,96 @@
+"""Batched matching of face encodings against the enrolled gallery."""
+import math
+
+import numpy as np
+
+from . import config
+from .ann import load_or_build_index, top_k
+from .gallery import cache_path_for, load_gallery
+
+ENCODING_SIZE = 128
+
+
+class FaceMatcher:
+    """Holds the gallery as one (N, 128) float32 matrix with precomputed norms.
+
+    All faces of a frame are matched with a single matrix product, using
+    |a - b|^2 = |a|^2 + |b|^2 - 2 a.b, which gives the same distances as
+    face_recognition.face_distance without re-stacking the gallery per call.
+    An optional ANN `index` (see app.ann) replaces the exact scan.
+    """
+
+    def __init__(self, names, encodings, tolerance=0.6, index=None):
+        self.names = list(names)
+        self.encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        self.norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+        self.tolerance = tolerance
+        self.index = index
+        if len(self.names) != len(self.encodings):
+            raise ValueError(f"{len(self.names)} names for {len(self.encodings)} encodings")
+
+    def __len__(self):
+        return len(self.names)
+
+    def distances(self, faces):
+        """Return the (K, N) Euclidean distances between K faces and the gallery."""
+        faces = np.asarray(faces, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        squared = np.einsum('ij,ij->i', faces, faces)[:, None] + self.norms[None, :]
+        squared -= 2.0 * (faces @ self.encodings.T)
+        np.maximum(squared, 0.0, out=squared)
+        return np.sqrt(squared, out=squared)
+
+    def match(self, faces, k=1):
+        """Return, for each face, its k nearest (name, distance) pairs, closest first."""
+        faces = np.asarray(faces, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if not len(self) or not len(faces):
+            return [[] for _ in range(len(faces))]
+
+        k = min(k, len(self))
+        if self.index is not None:
+            top, top_dist = self.index.search(faces, k)
+        else:
+            top, top_dist = self._exact_search(faces, k)
+        return [
+            [(self.names[i], float(d)) for i, d in zip(row, row_dist) if i >= 0]
+            for row, row_dist in zip(top, top_dist)
+        ]
+
+    def _exact_search(self, faces, k):
+        return top_k(self.distances(faces), k)
+
+    def identify(self, faces):
+        """Return (name, distance) per face; name is None when nobody is within tolerance."""
+        results = []
+        for candidates in self.match(faces, k=1):
+            if candidates and candidates[0][1] <= self.tolerance:
+                results.append(candidates[0])
+            else:
+                results.append((None, candidates[0][1] if candidates else float('inf')))
+        return results
+
+
+def json_distance(distance):
+    """A match distance for JSON replies: rounded, or None when it is inf (e.g. an empty gallery)."""
+    distance = float(distance)
+    return round(distance, 4) if math.isfinite(distance) else None
+
+
+def load_matcher(path=config.GALLERY_PATH, index_kind=config.FACE_INDEX):
+    """Load the gallery at `path` and wrap it in a FaceMatcher."""
+    names, encodings = load_gallery(path)
+    return build_matcher(names, encodings, path, index_kind)
+
+
+def build_matcher(names, encodings, path=config.GALLERY_PATH, index_kind=config.FACE_INDEX, save_index=True):
+    """Wrap gallery encodings in a FaceMatcher, with an ANN index if configured.
+
+    When `index_kind` is 'ivf' or 'faiss' and the gallery has at least
+    FACE_INDEX_MIN_SIZE faces, the matching ANN index is loaded from next
+    to the gallery cache, or built and saved there if the gallery changed
+    (only kept in memory with `save_index` False).
+    """
+    index = None
+    if index_kind != 'exact' and len(names) >= config.FACE_INDEX_MIN_SIZE:
+        index = load_or_build_index(cache_path_for(path), index_kind, encodings, config.FACE_INDEX_NPROBE,
+                                    save=save_index)
+    return FaceMatcher(names, encodings, index=index)
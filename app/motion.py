@@ -0,0 +1,72 @@
+"""Cheap motion / scene-change gate that runs before face detection."""
+import cv2
+import numpy as np
+
+from . import config
+
+
+class MotionGate:
+    """Decides per frame whether face detection is worth running.
+
+    Each frame is shrunk to `width` pixels wide, converted to grey and
+    compared with a running-average background. When more than
+    `min_area` of the pixels differ by over `threshold` grey levels, the
+    gate opens for the next `active_frames` frames. While the scene is
+    idle only every `idle_every`-th frame goes through, so tracks still
+    expire and slow changes are still noticed.
+    """
+
+    def __init__(self, threshold=25, min_area=0.002, active_frames=30, idle_every=15,
+                 width=160, learning_rate=0.05):
+        self.threshold = threshold
+        self.min_area = min_area
+        self.active_frames = active_frames
+        self.idle_every = idle_every
+        self.width = width
+        self.learning_rate = learning_rate
+        self.background = None
+        self.active = 0
+        self.idle = 0
+        self.processed = 0
+        self.skipped = 0
+
+    def motion(self, frame):
+        """Return the fraction of changed pixels, and update the background."""
+        scale = self.width / frame.shape[1]
+        small = cv2.resize(frame, (0, 0), None, scale, scale, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (5, 5), 0).astype(np.float32)
+
+        if self.background is None or self.background.shape != small.shape:
+            self.background = small
+            return 1.0
+        diff = cv2.absdiff(small, self.background)
+        cv2.accumulateWeighted(small, self.background, self.learning_rate)
+        return float(np.count_nonzero(diff > self.threshold)) / diff.size
+
+    def should_process(self, frame):
+        if self.motion(frame) > self.min_area:
+            self.active = self.active_frames
+        if self.active > 0:
+            self.active -= 1
+            self.idle = 0
+            go = True
+        else:
+            self.idle += 1
+            go = self.idle >= self.idle_every
+            if go:
+                self.idle = 0
+        if go:
+            self.processed += 1
+        else:
+            self.skipped += 1
+        return go
+
+    def stats(self):
+        return {"processed": self.processed, "skipped": self.skipped, "active": self.active > 0}
+
+
+def motion_gate_for(camera_id):
+    """Build the MotionGate for a camera, applying its CAMERA_MOTION overrides."""
+    return MotionGate(**config.CAMERA_MOTION.get(str(camera_id), {}))
@@ -0,0 +1,145 @@
+"""Per-camera recognition: detect, track, encode only what changed, match."""
+import threading
+from collections import namedtuple
+
+import cv2
+import face_recognition
+
+from .ingest import decode_frame
+from .ladder import JpegLadder, LadderFrame
+from .tracker import FaceTracker
+
+# box is (top, right, bottom, left) in full-frame coordinates; name is None for unknown faces
+FaceResult = namedtuple('FaceResult', 'track_id box name distance')
+
+
+class FrameRecognizer:
+    """Recognizes faces in consecutive frames of one camera.
+
+    face_locations runs on every processed frame, but the 68-landmark +
+    ResNet encoding only runs for tracks the FaceTracker flags as new,
+    stale or moved; other faces keep the identity cached on their track.
+    With a MotionGate, frames where nothing changed skip detection
+    entirely and return the previous results.
+    """
+
+    def __init__(self, matcher, scale=0.25, tracker=None, gate=None):
+        self.matcher = matcher
+        self.scale = scale
+        self.tracker = tracker or FaceTracker()
+        self.gate = gate
+        self.last_results = []
+        self.frames = 0
+        self.faces = 0
+        self.encoded = 0
+
+    def process(self, frame):
+        """Recognize faces in a full-resolution BGR frame."""
+        if self.gate is not None and not self.gate.should_process(frame):
+            return self.last_results
+        imgS = cv2.resize(frame, (0, 0), None, self.scale, self.scale)
+        imgS = cv2.cvtColor(imgS, cv2.COLOR_BGR2RGB)
+        return self.process_small(imgS)
+
+    def process_small(self, imgS):
+        """Recognize faces in an RGB frame already downscaled by `scale`."""
+        facesCurFrame = face_recognition.face_locations(imgS)
+        tracked = self.tracker.update(facesCurFrame)
+
+        stale = [track for track, needs_encoding in tracked if needs_encoding]
+        if stale:
+            encodesCurFrame = face_recognition.face_encodings(imgS, [track.box for track in stale])
+            for track, (name, distance) in zip(stale, self.matcher.identify(encodesCurFrame)):
+                self.tracker.set_identity(track, name, distance)
+
+        self.frames += 1
+        self.faces += len(tracked)
+        self.encoded += len(stale)
+        self.last_results = [
+            FaceResult(track.id, tuple(int(v / self.scale) for v in track.box), track.name, track.distance)
+            for track, _ in tracked
+        ]
+        return self.last_results
+
+    def stats(self):
+        stats = {"frames": self.frames, "faces": self.faces, "encoded": self.encoded}
+        if self.gate is not None:
+            stats["motion"] = self.gate.stats()
+        return stats
+
+
+def draw_results(frame, results, scale=1.0, show_ids=False):
+    """Draw boxes and names: green for known faces, red for unknown ones.
+
+    `scale` maps full-frame boxes onto a resized frame; with `show_ids`
+    labels start with the track id.
+    """
+    for result in results:
+        top, right, bottom, left = (int(v * scale) for v in result.box)
+        if result.name is not None:
+            color, label = (0, 255, 0), result.name.upper()
+        else:
+            color, label = (0, 0, 255), "Unknown"
+        if show_ids:
+            label = f"#{result.track_id} {label}"
+        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+        cv2.putText(frame, label, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+    return frame
+
+
+def detect_frame(data, scale=0.25):
+    """Decode an uploaded image and return (small RGB image, face locations), or None if it is unreadable.
+
+    This is the per-frame half of /receive_frame; the faces are then encoded
+    in batches by app.batching. It holds no app state so it can run in a
+    worker process.
+    """
+    imgS = decode_frame(data, scale)
+    if imgS is None:
+        return None
+    return imgS, face_recognition.face_locations(imgS)
+
+
+class CameraPipeline:
+    """One recognition loop per camera, feeding a FrameHub with LadderFrames.
+
+    However many viewers subscribe to the hub, each frame is detected and
+    annotated once, and encoded at most once per ladder rung in use.
+    `quality` is the best rung's JPEG quality (see JpegLadder.with_quality).
+    """
+
+    def __init__(self, capture, recognizer, hub, quality=80, ladder=None):
+        self.capture = capture
+        self.recognizer = recognizer
+        self.hub = hub
+        self.ladder = ladder or JpegLadder.with_quality(quality)
+        self.latest_results = []
+        self._thread = threading.Thread(target=self._run, name=f'pipeline-{capture.source}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            success, frame = self.capture.read()
+            if not success:
+                if not self.capture.isOpened():
+                    break
+                continue
+
+            self.latest_results = self.recognizer.process(frame)
+            # The capture may hand the same frame to other readers, so draw on a copy
+            annotated = draw_results(frame.copy(), self.latest_results)
+            # Viewers encode the rungs they need, each at most once per frame
+            self.hub.publish(LadderFrame(annotated, self.ladder))
+            self.capture.mark_result()
+        self.hub.close()
+
+    def stats(self):
+        return {
+            "capture": self.capture.stats(),
+            "recognizer": self.recognizer.stats(),
+            "viewers": self.hub.subscribers,
+            "encoder": self.ladder.stats(),
+        }
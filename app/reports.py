@@ -0,0 +1,193 @@
+"""Per-person, per-day attendance rollups and the report endpoints over them."""
+import logging
+import threading
+from datetime import date
+
+from flask import Blueprint, jsonify, request
+
+from .attendance import ABSENCE_MINUTES
+
+logger = logging.getLogger(__name__)
+
+DAILY_SCHEMA = {
+    'mysql': [
+        """CREATE TABLE IF NOT EXISTS attendance_daily (
+            name VARCHAR(255) NOT NULL,
+            day DATE NOT NULL,
+            first_seen DATETIME NOT NULL,
+            last_seen DATETIME NOT NULL,
+            hours DOUBLE NOT NULL DEFAULT 0,
+            discipline_status TINYINT NOT NULL DEFAULT 1,
+            sightings INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (name, day),
+            KEY idx_attendance_daily_day (day)
+        )""",
+    ],
+    'sqlite': [
+        """CREATE TABLE IF NOT EXISTS attendance_daily (
+            name TEXT NOT NULL,
+            day DATE NOT NULL,
+            first_seen TIMESTAMP NOT NULL,
+            last_seen TIMESTAMP NOT NULL,
+            hours REAL NOT NULL DEFAULT 0,
+            discipline_status INTEGER NOT NULL DEFAULT 1,
+            sightings INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (name, day)
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_attendance_daily_day ON attendance_daily (day)",
+        "CREATE INDEX IF NOT EXISTS idx_attendance2_name ON attendance2 (name)",
+    ],
+}
+
+UPSERT_SQL = {
+    'mysql': """INSERT INTO attendance_daily
+            (name, day, first_seen, last_seen, hours, discipline_status, sightings)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            first_seen = LEAST(first_seen, VALUES(first_seen)),
+            last_seen = GREATEST(last_seen, VALUES(last_seen)),
+            hours = hours + VALUES(hours),
+            discipline_status = LEAST(discipline_status, VALUES(discipline_status)),
+            sightings = sightings + VALUES(sightings)""",
+    'sqlite': """INSERT INTO attendance_daily
+            (name, day, first_seen, last_seen, hours, discipline_status, sightings)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (name, day) DO UPDATE SET
+            first_seen = MIN(first_seen, excluded.first_seen),
+            last_seen = MAX(last_seen, excluded.last_seen),
+            hours = hours + excluded.hours,
+            discipline_status = MIN(discipline_status, excluded.discipline_status),
+            sightings = sightings + excluded.sightings""",
+}
+
+DAILY_COLUMNS = ('name', 'day', 'first_seen', 'last_seen', 'hours', 'discipline_status', 'sightings')
+
+
+def ensure_schema(storage):
+    """Create the rollup table and the indexes the reports rely on."""
+    with storage.transaction() as cursor:
+        for statement in DAILY_SCHEMA[storage.dialect]:
+            cursor.execute(statement)
+    if storage.dialect == 'mysql':
+        # attendance2 predates this module; add the name index the UPDATEs need if it is missing
+        try:
+            found = storage.query(
+                "SELECT COUNT(*) FROM information_schema.statistics WHERE table_schema = DATABASE() "
+                "AND table_name = 'attendance2' AND index_name = 'idx_attendance2_name'")
+            if not found[0][0]:
+                storage.execute("CREATE INDEX idx_attendance2_name ON attendance2 (name(64))")
+        except Exception as e:
+            logger.warning("Could not add the attendance2 name index: %s", e)
+
+
+class DailyRollup:
+    """Turns sightings into per-person-per-day deltas, coalesced between flushes.
+
+    Hours accumulate the gaps between consecutive sightings on the same
+    day; a gap longer than ABSENCE_MINUTES is not counted and marks the
+    day's discipline_status as 0, matching the live attendance rules.
+    Because every delta is additive (or a min/max), a flush is a single
+    upsert per person-day and never needs to read the table.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._lock = threading.Lock()
+        self._last_seen = {}
+        self._pending = {}
+
+    def add(self, name, current_time):
+        key = (name, current_time.date())
+        with self._lock:
+            previous = self._last_seen.get(name)
+            self._last_seen[name] = current_time
+            hours, status = 0.0, 1
+            if previous is not None and previous.date() == key[1]:
+                gap = (current_time - previous).total_seconds()
+                if gap / 60.0 > ABSENCE_MINUTES:
+                    status = 0
+                elif gap > 0:
+                    hours = gap / 3600.0
+
+            row = self._pending.get(key)
+            if row is None:
+                self._pending[key] = [current_time, current_time, hours, status, 1]
+            else:
+                row[0] = min(row[0], current_time)
+                row[1] = max(row[1], current_time)
+                row[2] += hours
+                row[3] = min(row[3], status)
+                row[4] += 1
+
+    def take(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        return batch
+
+    def write(self, cursor, batch):
+        """Upsert a batch from take() using the caller's transaction."""
+        if batch:
+            cursor.executemany(UPSERT_SQL[self.storage.dialect],
+                               [(name, day, *row) for (name, day), row in batch.items()])
+
+    def requeue(self, batch):
+        """Merge a batch whose transaction failed back into the pending deltas."""
+        with self._lock:
+            for key, old in batch.items():
+                row = self._pending.get(key)
+                if row is None:
+                    self._pending[key] = old
+                else:
+                    row[0], row[1] = min(row[0], old[0]), max(row[1], old[1])
+                    row[2] += old[2]
+                    row[3] = min(row[3], old[3])
+                    row[4] += old[4]
+
+
+def _date_arg(name, default):
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else default
+
+
+def reports_blueprint(storage):
+    """Blueprint with /reports/daily and /reports/summary over attendance_daily."""
+    bp = Blueprint('reports', __name__, url_prefix='/reports')
+
+    def date_range():
+        today = date.today()
+        start = _date_arg('from', today.replace(day=1))
+        end = _date_arg('to', today)
+        return start, end
+
+    @bp.errorhandler(ValueError)
+    def bad_request(e):
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    @bp.route('/daily', methods=['GET'])
+    def daily():
+        """Rollup rows for ?from=YYYY-MM-DD&to=YYYY-MM-DD, optionally for one &name=."""
+        start, end = date_range()
+        name = request.args.get('name')
+        sql = f"SELECT {', '.join(DAILY_COLUMNS)} FROM attendance_daily WHERE day BETWEEN %s AND %s"
+        params = [start, end]
+        if name:
+            sql += " AND name = %s"
+            params.append(name.upper())
+        sql += " ORDER BY day, name"
+        rows = storage.query(sql, params)
+        return jsonify({"from": start.isoformat(), "to": end.isoformat(),
+                        "rows": [dict(zip(DAILY_COLUMNS, row)) for row in rows]})
+
+    @bp.route('/summary', methods=['GET'])
+    def summary():
+        """Per-person totals over ?from=&to= (defaults to the current month)."""
+        start, end = date_range()
+        rows = storage.query(
+            "SELECT name, COUNT(*), SUM(hours), SUM(CASE WHEN discipline_status = 0 THEN 1 ELSE 0 END), "
+            "MIN(first_seen), MAX(last_seen) FROM attendance_daily "
+            "WHERE day BETWEEN %s AND %s GROUP BY name ORDER BY name", (start, end))
+        columns = ('name', 'days_present', 'total_hours', 'days_with_absence', 'first_seen', 'last_seen')
+        return jsonify({"from": start.isoformat(), "to": end.isoformat(),
+                        "people": [dict(zip(columns, row)) for row in rows]})
+
+    return bp
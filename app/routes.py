@@ -1,27 +1,38 @@
 from flask import Flask, render_template, request, jsonify
-import cv2
-import numpy as np
-import face_recognition
 import os
+import threading
+from . import config
+from .batching import BatchEncoder
+from .flow import FlowController
+from .gallery import enroll_image, remove_person
+from .ingest import decode_chips, parse_boxes, parse_padding
+from .matcher import build_matcher, json_distance, load_matcher
+from .pipeline import detect_frame
 
 app = Flask(__name__)
 
 # Load known faces
-path = 'lib/attendance'
-images = []
-classNames = []
-
-for cls in os.listdir(path):
-    curImg = cv2.imread(f'{path}/{cls}')
-    if curImg is not None:
-        images.append(curImg)
-        classNames.append(os.path.splitext(cls)[0])
-
-# Encode faces
-encodeListKnown = [
-    face_recognition.face_encodings(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))[0]
-    for img in images
-]
+path = config.GALLERY_PATH
+matcher = load_matcher(path)
+# Held by /enroll while it rebuilds the matcher; readers never take it
+enroll_lock = threading.Lock()
+# Faces from concurrent requests are encoded and matched in shared batches
+batcher = BatchEncoder(lambda: matcher, config.ENCODE_BATCH_FACES, config.ENCODE_BATCH_WAIT_MS / 1000.0).start()
+# Tells stream.js clients how fast to send and turns frames away with 429 when saturated
+flow = FlowController(config.RECEIVE_MAX_INFLIGHT, config.RECEIVE_MAX_INFLIGHT,
+                      config.STREAM_MIN_FPS, config.STREAM_MAX_FPS)
+
+def first_known_name(matches):
+    """Name of the first recognized face, or "Unknown"."""
+    for name, _ in matches:
+        if name is not None:
+            return name
+    return "Unknown"
+
+def face_results(locations, matches, scale=0.25):
+    """Per-face JSON results, with boxes in full-frame pixels."""
+    return [{"box": [int(v / scale) for v in location], "name": name, "distance": json_distance(distance)}
+            for location, (name, distance) in zip(locations, matches)]
 
 @app.route('/')
 def index():
@@ -30,29 +41,97 @@ def index():
 
 @app.route('/receive_frame', methods=['POST'])
 def receive_frame():
-    """Receive frame from the client."""
+    """Receive frame from the client; every reply carries the flow-control advice."""
     if 'frame' not in request.files:
         return jsonify({"status": "error", "message": "No frame received"}), 400
 
-    frame = request.files['frame'].read()
-    nparr = np.frombuffer(frame, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    token = flow.start(request.headers.get('X-Client-Id') or request.remote_addr)
+    if token is None:
+        body, headers = flow.busy_response()
+        return jsonify(body), 429, headers
+    try:
+        detected = detect_frame(request.files['frame'].read())
+        if detected is None:
+            return jsonify({"status": "error", "message": "Invalid image", "flow": flow.advice()}), 400
+        imgS, facesCurFrame = detected
+        matches = batcher.submit(imgS, facesCurFrame).result()
+    finally:
+        flow.finish(token)
+
+    return jsonify({"status": "success", "name": first_known_name(matches), "flow": flow.advice()})
+
+@app.route('/receive_faces', methods=['POST'])
+def receive_faces():
+    """Recognize face chips the client cropped itself: no detection, only encoding and matching.
+
+    Form fields: one `face` image per face, `boxes` (JSON list of
+    [top, right, bottom, left] in the client's frame, one per chip) and
+    optional `padding` (margin around the face in each chip, as a fraction
+    of the face size).
+    """
+    chips = request.files.getlist('face')
+    if not chips:
+        return jsonify({"status": "error", "message": "No face chips received"}), 400
+    if len(chips) > config.MAX_FACE_CHIPS:
+        return jsonify({"status": "error", "message": f"At most {config.MAX_FACE_CHIPS} face chips per request"}), 400
+
+    token = flow.start(request.headers.get('X-Client-Id') or request.remote_addr)
+    if token is None:
+        body, headers = flow.busy_response()
+        return jsonify(body), 429, headers
+    try:
+        try:
+            boxes = parse_boxes(request.form.get('boxes'), len(chips))
+            padding = parse_padding(request.form.get('padding'))
+            decoded = decode_chips([chip.read() for chip in chips], padding)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e), "flow": flow.advice()}), 400
+        futures = [batcher.submit(chip, [location]) for chip, location in decoded]
+        matches = [future.result()[0] for future in futures]
+    finally:
+        flow.finish(token)
+
+    return jsonify({"status": "success", "name": first_known_name(matches),
+                    "faces": face_results(boxes, matches, scale=1.0), "flow": flow.advice()})
+
+@app.route('/receive_frame/stats', methods=['GET'])
+def receive_frame_stats():
+    """Flow-control and batching counters."""
+    return jsonify({"flow": flow.stats(), "batching": batcher.stats()})
+
 
-    # Resize frame for processing
-    imgS = cv2.resize(img, (0, 0), None, 0.25, 0.25)
-    imgS = cv2.cvtColor(imgS, cv2.COLOR_BGR2RGB)
+@app.route('/enroll', methods=['POST'])
+def enroll():
+    """Add or replace a person from an uploaded photo, without restarting."""
+    global matcher
+    name = request.form.get('name', '').strip()
+    if 'image' not in request.files or not name:
+        return jsonify({"status": "error", "message": "Both 'name' and 'image' are required"}), 400
 
-    # Face detection and encoding
-    facesCurFrame = face_recognition.face_locations(imgS)
-    encodesCurFrame = face_recognition.face_encodings(imgS, facesCurFrame)
+    upload = request.files['image']
+    ext = os.path.splitext(upload.filename or '')[1].lower()
+    if ext not in ('.jpg', '.jpeg', '.png', '.bmp', '.webp'):
+        ext = '.jpg'
+    try:
+        with enroll_lock:
+            names, encodings = enroll_image(path, name, upload.read(), ext)
+            matcher = build_matcher(names, encodings, path)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
-    for encodeFace, faceLoc in zip(encodesCurFrame, facesCurFrame):
-        matches = face_recognition.compare_faces(encodeListKnown, encodeFace)
-        faceDis = face_recognition.face_distance(encodeListKnown, encodeFace)
-        matchIndex = np.argmin(faceDis)
+    return jsonify({"status": "success", "name": name, "enrolled": len(names)})
 
-        if matches[matchIndex]:
-            name = classNames[matchIndex]
-            return jsonify({"status": "success", "name": name})
+@app.route('/enroll/<name>', methods=['DELETE'])
+def unenroll(name):
+    """Remove a person from the gallery, without restarting."""
+    global matcher
+    try:
+        with enroll_lock:
+            names, encodings = remove_person(path, name)
+            matcher = build_matcher(names, encodings, path)
+    except KeyError:
+        return jsonify({"status": "error", "message": f"{name} is not enrolled"}), 404
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
-    return jsonify({"status": "success", "name": "Unknown"})
+    return jsonify({"status": "success", "name": name, "enrolled": len(names)})
@@ -0,0 +1,321 @@
+"""Runs capture and recognition for many cameras across a pool of worker processes."""
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+import cv2
+
+from . import config
+from .capture import LatestFrameCapture
+from .framering import FrameRing
+from .matcher import build_matcher, json_distance
+from .motion import MotionGate, motion_gate_for
+from .pipeline import FrameRecognizer
+
+logger = logging.getLogger(__name__)
+
+# One recognition worker reads each ring, so three slots always leave the capture one to write
+RING_SLOTS = 3
+
+
+def _is_stream(source):
+    return isinstance(source, str) and '://' in source
+
+
+def _send(results, message):
+    try:
+        results.put_nowait(message)
+        return True
+    except queue.Full:
+        return False
+
+
+def run_capture(camera, ring, results, stop):
+    """Capture process: decode one camera and copy every frame into its FrameRing.
+
+    Frames not of the camera's width x height are resized to it. Capture
+    stats go to `results` every second.
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    stream = _is_stream(camera['source'])
+    capture = LatestFrameCapture(camera['source'], camera['width'], camera['height'], reconnect=True,
+                                 ffmpeg_options=config.STREAM_FFMPEG_OPTIONS if stream else None,
+                                 decode_threads=config.STREAM_DECODE_THREADS if stream else 0)
+    size = (camera['width'], camera['height'])
+    reported = time.monotonic()
+    try:
+        while not stop.is_set():
+            success, frame = capture.read(timeout=0.5)
+            if success:
+                if frame.shape[1::-1] != size:
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                ring.write(frame)
+                capture.mark_result()
+            if time.monotonic() - reported >= 1.0:
+                reported = time.monotonic()
+                _send(results, ('capture', camera['id'], dict(capture.stats(), ring=ring.stats())))
+    finally:
+        capture.release()
+        ring.close()
+
+
+class _CameraSlot:
+    """One camera inside a recognition worker: its ring, recognizer and schedule."""
+
+    def __init__(self, camera, ring, matcher):
+        self.id = camera['id']
+        self.ring = ring
+        self.interval = 1.0 / camera['fps']
+        gate = MotionGate(**camera['motion']) if camera['motion'] else motion_gate_for(camera['source'])
+        self.recognizer = FrameRecognizer(matcher, gate=gate)
+        self.due = time.monotonic()
+        self.seq = 0
+        self.processed = 0
+        self.busy = 0.0
+        self.latency = None
+
+    def health(self, elapsed):
+        return {
+            "recognizer": self.recognizer.stats(),
+            "fps": round(self.processed / elapsed, 2),
+            "load": round(self.busy / elapsed, 3),
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+        }
+
+
+def run_worker(cameras, rings, gallery, results, stop):
+    """Recognition process: recognize `cameras` until `stop` is set, earliest deadline first.
+
+    Each camera's frames are read from its FrameRing in `rings` as views
+    into shared memory, written there by its capture process. Each camera
+    is due again 1/fps after its last frame. When the worker cannot keep
+    up, every camera is overdue and the most overdue one goes next, so
+    they share the CPU evenly instead of the fastest camera starving the
+    rest. Results and, every second, health go to `results`.
+
+    `gallery` is the (names, encodings) the parent loaded. Workers never
+    encode photos or write the gallery cache or index files themselves:
+    they are daemonic, so they cannot start encoding pools, and several
+    of them would race on the same files.
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    names, encodings = gallery
+    matcher = build_matcher(names, encodings, config.GALLERY_PATH, save_index=False)
+    slots = [_CameraSlot(camera, ring, matcher) for camera, ring in zip(cameras, rings)]
+    window_started = time.monotonic()
+    dropped = 0
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            if now - window_started >= 1.0:
+                for slot in slots:
+                    _send(results, ('health', slot.id, slot.health(now - window_started)))
+                    slot.processed, slot.busy = 0, 0.0
+                window_started = now
+
+            slot = min(slots, key=lambda s: s.due)
+            if slot.due > now:
+                stop.wait(min(slot.due - now, 0.5))
+                continue
+            seq, frame, captured_at = slot.ring.read_latest(slot.seq, timeout=0)
+            if frame is None:
+                # Nothing new from this camera yet; look again shortly
+                slot.due = now + min(slot.interval, 0.01)
+                continue
+
+            slot.seq = seq
+            try:
+                faces = slot.recognizer.process(frame)
+            finally:
+                # The view must be gone before the slot is unpinned and the ring closed
+                frame = None
+                slot.ring.release(seq)
+            finished = time.monotonic()
+            latency = finished - captured_at
+            slot.latency = latency if slot.latency is None else 0.9 * slot.latency + 0.1 * latency
+            slot.processed += 1
+            slot.busy += finished - now
+            slot.due = max(slot.due + slot.interval, finished)
+            if not _send(results, ('result', slot.id, time.time(), [tuple(face) for face in faces])):
+                dropped += 1
+    finally:
+        for slot in slots:
+            slot.ring.close()
+        if dropped:
+            logger.warning("Worker dropped %d results because the queue was full.", dropped)
+
+
+class CameraScheduler:
+    """Runs one capture process per enabled camera and spreads recognition over `workers` processes.
+
+    Each capture process decodes its camera into a shared-memory FrameRing
+    (see app.framering), so frames reach recognition without pickling.
+    Cameras are assigned to recognition workers greedily by FPS cap to
+    the least loaded one, and every worker matches against `gallery`, the
+    (names, encodings) loaded once by the caller (see
+    app.matcher.load_matcher). apply() re-reads the registry and restarts
+    only the processes whose cameras changed; a process that dies is
+    restarted. `on_result` is called with (camera_id, timestamp, faces)
+    for every recognized frame, where faces are (track_id, box, name,
+    distance) tuples.
+    """
+
+    def __init__(self, registry, gallery, workers=config.CAMERA_WORKERS, on_result=None, queue_size=10000):
+        self.registry = registry
+        self.gallery = gallery
+        self.workers = workers
+        self.on_result = on_result
+        self._ctx = multiprocessing.get_context('spawn')
+        self._results = self._ctx.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._captures = {}
+        self._workers = {}
+        self._status = {}
+        self._stopping = threading.Event()
+        self._collector = threading.Thread(target=self._collect, name='camera-results', daemon=True)
+        self.restarts = 0
+
+    def start(self):
+        self.apply()
+        self._collector.start()
+        return self
+
+    def assign(self, cameras):
+        """Return one list of cameras per worker, balancing the sum of FPS caps."""
+        groups = [[] for _ in range(min(self.workers, len(cameras)))]
+        loads = [0.0] * len(groups)
+        for camera in sorted(cameras, key=lambda c: (-c['fps'], c['id'])):
+            index = loads.index(min(loads))
+            groups[index].append(camera)
+            loads[index] += camera['fps']
+        return groups
+
+    def apply(self):
+        """Bring the capture and worker processes in line with the registry."""
+        cameras = {camera['id']: camera for camera in self.registry.enabled()}
+        groups = {tuple(sorted(c['id'] for c in group)): group for group in self.assign(list(cameras.values()))}
+        with self._lock:
+            # Workers go first: they read the rings of the captures stopped below
+            for key in list(self._workers):
+                if key not in groups or self._workers[key][2] != groups[key]:
+                    self._stop_worker(key)
+            for camera_id in list(self._captures):
+                if self._captures[camera_id][2] != cameras.get(camera_id):
+                    self._stop_capture(camera_id)
+            for camera in cameras.values():
+                if camera['id'] not in self._captures:
+                    ring = FrameRing((camera['height'], camera['width'], 3), RING_SLOTS, ctx=self._ctx)
+                    self._start_capture(camera, ring)
+            for key, group in groups.items():
+                if key not in self._workers:
+                    self._start_worker(key, group)
+            self._status = {camera_id: status for camera_id, status in self._status.items() if camera_id in cameras}
+
+    def _start_capture(self, camera, ring):
+        stop = self._ctx.Event()
+        process = self._ctx.Process(target=run_capture, args=(camera, ring, self._results, stop),
+                                    name=f"capture-{camera['id']}", daemon=True)
+        process.start()
+        self._captures[camera['id']] = (process, stop, camera, ring)
+        logger.info("Started capture %d for camera %s.", process.pid, camera['id'])
+
+    def _start_worker(self, key, group):
+        stop = self._ctx.Event()
+        rings = [self._captures[camera['id']][3] for camera in group]
+        process = self._ctx.Process(target=run_worker, args=(group, rings, self.gallery, self._results, stop),
+                                    name=f"cameras-{'-'.join(key)}", daemon=True)
+        process.start()
+        self._workers[key] = (process, stop, group)
+        logger.info("Started worker %d for cameras %s.", process.pid, ', '.join(key))
+
+    @staticmethod
+    def _stop_process(process, stop):
+        stop.set()
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    def _stop_capture(self, camera_id):
+        process, stop, _, ring = self._captures.pop(camera_id)
+        self._stop_process(process, stop)
+        ring.close()
+        ring.unlink()
+
+    def _stop_worker(self, key):
+        process, stop, _ = self._workers.pop(key)
+        self._stop_process(process, stop)
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while not self._stopping.is_set():
+            try:
+                kind, camera_id, *payload = self._results.get(timeout=1.0)
+            except queue.Empty:
+                kind = None
+            if kind == 'result':
+                timestamp, faces = payload
+                with self._lock:
+                    status = self._status.setdefault(camera_id, {})
+                    status['results'] = faces
+                    status['last_result'] = timestamp
+                if self.on_result is not None:
+                    try:
+                        self.on_result(camera_id, timestamp, faces)
+                    except Exception as e:
+                        logger.error("Handling results of camera %s failed: %s", camera_id, e)
+            elif kind in ('health', 'capture'):
+                with self._lock:
+                    self._status.setdefault(camera_id, {})[kind] = payload[0]
+
+            if time.monotonic() - last_check >= 1.0:
+                last_check = time.monotonic()
+                self._restart_dead()
+
+    def _restart_dead(self):
+        with self._lock:
+            if self._stopping.is_set():
+                return
+            for camera_id, (process, _, camera, ring) in list(self._captures.items()):
+                if not process.is_alive():
+                    logger.error("Capture for camera %s exited with %s; restarting.", camera_id, process.exitcode)
+                    self.restarts += 1
+                    self._start_capture(camera, ring)
+            for key, (process, _, group) in list(self._workers.items()):
+                if not process.is_alive():
+                    logger.error("Worker for cameras %s exited with %s; restarting.", ', '.join(key), process.exitcode)
+                    del self._workers[key]
+                    self.restarts += 1
+                    # Frames the dead worker had pinned would never be released
+                    for camera in group:
+                        self._captures[camera['id']][3].clear_pins()
+                    self._start_worker(key, group)
+
+    def camera_status(self, camera_id, results=False):
+        """Capture and recognition health and last result time of one camera, plus its latest faces if `results`."""
+        with self._lock:
+            status = dict(self._status.get(camera_id, {}))
+        faces = status.pop('results', [])
+        if results:
+            status['faces'] = [{"track_id": track_id, "box": list(box), "name": name,
+                                "distance": json_distance(distance)}
+                               for track_id, box, name, distance in faces]
+        return status
+
+    def stats(self):
+        with self._lock:
+            captures = [{"pid": process.pid, "alive": process.is_alive(), "camera": camera_id}
+                        for camera_id, (process, _, _, _) in self._captures.items()]
+            workers = [{"pid": process.pid, "alive": process.is_alive(), "cameras": list(key)}
+                       for key, (process, _, _) in self._workers.items()]
+        return {"captures": captures, "workers": workers, "restarts": self.restarts}
+
+    def stop(self):
+        self._stopping.set()
+        with self._lock:
+            for key in list(self._workers):
+                self._stop_worker(key)
+            for camera_id in list(self._captures):
+                self._stop_capture(camera_id)
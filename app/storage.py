@@ -0,0 +1,251 @@
+"""Pooled database access with interchangeable MySQL and SQLite backends."""
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from . import config
+
+try:
+    import mysql.connector
+except ImportError:
+    mysql = None
+
+logger = logging.getLogger(__name__)
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance2 (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    entry_time TIMESTAMP,
+    last_seen_time TIMESTAMP,
+    discipline_status INTEGER,
+    working_hours REAL
+)
+"""
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+
+
+class ConnectionPool:
+    """A fixed-size, thread-safe pool of DB-API connections.
+
+    Connections are created lazily by `factory`, checked with `check`
+    before being handed out, and replaced when the check fails.
+    """
+
+    def __init__(self, factory, size=4, check=None, timeout=10.0):
+        self.factory = factory
+        self.check = check
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("No database connection available")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+        try:
+            if conn is not None and self.check is not None and not self.check(conn):
+                self._discard(conn)
+                conn = None
+            return conn if conn is not None else self.factory()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, broken=False):
+        if broken:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+class Storage:
+    """Common interface: transaction(), execute(), executemany() and query().
+
+    SQL is always written with %s placeholders; backends translate them.
+    `dialect` names the SQL flavour for the few statements that differ.
+    """
+
+    dialect = None
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def _cursor(self, conn):
+        return conn.cursor()
+
+    @contextmanager
+    def transaction(self):
+        """Yield a cursor; commit on success, roll back and re-raise on error."""
+        conn = self.pool.acquire()
+        broken = False
+        cursor = None
+        try:
+            cursor = self._cursor(conn)
+            yield cursor
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    broken = True
+            self.pool.release(conn, broken)
+
+    def execute(self, sql, params=()):
+        with self.transaction() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def executemany(self, sql, rows):
+        with self.transaction() as cursor:
+            cursor.executemany(sql, rows)
+            return cursor.rowcount
+
+    def query(self, sql, params=()):
+        with self.transaction() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def close(self):
+        self.pool.close()
+
+
+class _MySQLCursor:
+    """Prepared statements for execute(), a plain cursor for executemany().
+
+    mysql.connector only folds an executemany() INSERT into one multi-row
+    statement on plain cursors; a prepared cursor sends one row per round
+    trip, which would undo the writer's batching.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._prepared = None
+        self._plain = None
+        self._last = None
+
+    def execute(self, sql, params=()):
+        if self._prepared is None:
+            self._prepared = self._conn.cursor(prepared=True)
+        self._last = self._prepared
+        return self._prepared.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        if self._plain is None:
+            self._plain = self._conn.cursor()
+        self._last = self._plain
+        return self._plain.executemany(sql, rows)
+
+    def close(self):
+        for cursor in (self._prepared, self._plain):
+            if cursor is not None:
+                cursor.close()
+
+    def __getattr__(self, name):
+        if self._last is None:
+            raise AttributeError(name)
+        return getattr(self._last, name)
+
+
+class MySQLStorage(Storage):
+    """MySQL through mysql.connector; single statements use prepared cursors.
+
+    Pooled connections are pinged with reconnect before use, so a server
+    restart or idle timeout costs a reconnect instead of an error.
+    """
+
+    dialect = 'mysql'
+
+    def __init__(self, pool_size=4, **db_config):
+        if mysql is None:
+            raise RuntimeError("The mysql backend requires mysql-connector-python")
+        super().__init__(ConnectionPool(lambda: mysql.connector.connect(**db_config), pool_size, self._ping))
+
+    @staticmethod
+    def _ping(conn):
+        try:
+            conn.ping(reconnect=True, attempts=3, delay=1)
+            return True
+        except mysql.connector.Error as e:
+            logger.warning("Dropping dead MySQL connection: %s", e)
+            return False
+
+    def _cursor(self, conn):
+        return _MySQLCursor(conn)
+
+
+class _SQLiteCursor:
+    """Adapts %s placeholders to sqlite3's qmark style."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        return self._cursor.execute(sql.replace('%s', '?'), params)
+
+    def executemany(self, sql, rows):
+        return self._cursor.executemany(sql.replace('%s', '?'), rows)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class SQLiteStorage(Storage):
+    """Local SQLite database in WAL mode, for boxes without a MySQL server."""
+
+    dialect = 'sqlite'
+
+    def __init__(self, path='attendance.db', pool_size=4):
+        self.path = path
+        super().__init__(ConnectionPool(self._connect, pool_size))
+        with self.transaction() as cursor:
+            cursor.execute(SQLITE_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, cached_statements=256)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _cursor(self, conn):
+        return _SQLiteCursor(conn.cursor())
+
+
+def open_storage(db_config=None, backend=None):
+    """Open the configured backend: DB_BACKEND=mysql (default) or sqlite."""
+    backend = backend or config.DB_BACKEND
+    if backend == 'sqlite':
+        return SQLiteStorage(config.SQLITE_PATH, config.DB_POOL_SIZE)
+    if backend == 'mysql':
+        return MySQLStorage(config.DB_POOL_SIZE, **(db_config or {}))
+    raise ValueError(f"Unknown DB_BACKEND {backend!r}")
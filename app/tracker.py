@@ -0,0 +1,113 @@
+"""Lightweight multi-frame face tracker over face_locations boxes."""
+import itertools
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _centre_distance(a, b):
+    """Distance between box centres, relative to the size of box `a`."""
+    dy = (a[0] + a[2] - b[0] - b[2]) / 2
+    dx = (a[1] + a[3] - b[1] - b[3]) / 2
+    size = max(a[2] - a[0], a[1] - a[3], 1)
+    return (dx * dx + dy * dy) ** 0.5 / size
+
+
+class Track:
+    """A face followed across frames, with the identity from its last encoding."""
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.name = None
+        self.distance = float('inf')
+        self.encoded_box = None
+        self.frames_since_encode = 0
+        self.misses = 0
+
+
+class FaceTracker:
+    """Associates detections with tracks by IoU, falling back to centre distance.
+
+    A track is flagged for encoding when it is new, every `reencode_every`
+    frames (`unknown_reencode_every` while it is still unidentified), or
+    when its box moved or changed size so that the IoU with the box it was
+    last encoded at drops below `change_iou`. Tracks that go unmatched for
+    more than `max_misses` frames are dropped.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_centre_distance=0.5, reencode_every=30,
+                 unknown_reencode_every=5, change_iou=0.5, max_misses=5):
+        self.iou_threshold = iou_threshold
+        self.max_centre_distance = max_centre_distance
+        self.reencode_every = reencode_every
+        self.unknown_reencode_every = unknown_reencode_every
+        self.change_iou = change_iou
+        self.max_misses = max_misses
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, boxes):
+        """Match this frame's boxes to tracks and return [(track, needs_encoding)] in box order."""
+        pairs = sorted(
+            ((iou(track.box, box), t, b) for t, track in enumerate(self.tracks) for b, box in enumerate(boxes)),
+            reverse=True)
+        assigned = {}
+        used = set()
+        for overlap, t, b in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if b not in assigned and t not in used:
+                assigned[b] = self.tracks[t]
+                used.add(t)
+
+        # Fast movers can jump out of IoU range between frames; match them by centre
+        for b, box in enumerate(boxes):
+            if b in assigned:
+                continue
+            best = min(
+                ((_centre_distance(track.box, box), t) for t, track in enumerate(self.tracks) if t not in used),
+                default=None)
+            if best is not None and best[0] <= self.max_centre_distance:
+                assigned[b] = self.tracks[best[1]]
+                used.add(best[1])
+
+        for t, track in enumerate(self.tracks):
+            if t not in used:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        results = []
+        for b, box in enumerate(boxes):
+            track = assigned.get(b)
+            if track is None:
+                track = Track(next(self._ids), box)
+                self.tracks.append(track)
+            track.box = box
+            track.misses = 0
+            track.frames_since_encode += 1
+            results.append((track, self._needs_encoding(track)))
+        return results
+
+    def _needs_encoding(self, track):
+        if track.encoded_box is None:
+            return True
+        every = self.reencode_every if track.name is not None else self.unknown_reencode_every
+        if track.frames_since_encode >= every:
+            return True
+        return iou(track.box, track.encoded_box) < self.change_iou
+
+    def set_identity(self, track, name, distance):
+        """Record the result of encoding a track at its current box."""
+        track.name = name
+        track.distance = distance
+        track.encoded_box = track.box
+        track.frames_since_encode = 0
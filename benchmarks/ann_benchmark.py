@@ -0,0 +1,70 @@
+"""Recall vs latency of the ANN gallery indexes compared with exact search.
+
+Usage: python -m benchmarks.ann_benchmark --size 50000 --queries 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app import ann
+from app.matcher import FaceMatcher
+
+
+def synthetic_gallery(size, queries, seed=0):
+    """Random identities spaced like dlib encodings, plus noisy re-captures of some of them."""
+    rng = np.random.default_rng(seed)
+    # Different people sit ~0.9 apart, re-captures of one person ~0.35 from the enrolled photo
+    gallery = rng.normal(0.0, 0.9 / np.sqrt(2 * 128), (size, 128)).astype(np.float32)
+    truth = rng.choice(size, queries, replace=False)
+    probes = gallery[truth] + rng.normal(0.0, 0.35 / np.sqrt(128), (queries, 128)).astype(np.float32)
+    return gallery, probes, truth
+
+
+def timed(search, probes, batch):
+    start = time.perf_counter()
+    results = [search(probes[i:i + batch]) for i in range(0, len(probes), batch)]
+    elapsed = time.perf_counter() - start
+    return np.concatenate(results), elapsed / len(probes) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=50000, help='number of enrolled faces')
+    parser.add_argument('--queries', type=int, default=500, help='number of probe faces')
+    parser.add_argument('--batch', type=int, default=4, help='faces matched per call, like faces per frame')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    gallery, probes, truth = synthetic_gallery(args.size, args.queries)
+    matcher = FaceMatcher(range(args.size), gallery)
+    exact, exact_ms = timed(lambda q: matcher._exact_search(q, 1)[0][:, 0], probes, args.batch)
+
+    print(f"gallery={args.size} queries={args.queries} batch={args.batch}")
+    print(f"{'method':<26}{'build s':>10}{'ms/face':>10}{'recall@1':>10}{'top1 ok':>10}")
+    print(f"{'exact':<26}{'-':>10}{exact_ms:>10.3f}{1.0:>10.3f}{np.mean(exact == truth):>10.3f}")
+
+    start = time.perf_counter()
+    ivf = ann.IVFIndex.build(gallery)
+    build_s = time.perf_counter() - start
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        found, ms = timed(lambda q: ivf.search(q, 1)[0][:, 0], probes, args.batch)
+        label = f'ivf nlist={len(ivf.centroids)} nprobe={nprobe}'
+        print(f"{label:<26}{build_s:>10.2f}{ms:>10.3f}{np.mean(found == exact):>10.3f}{np.mean(found == truth):>10.3f}")
+
+    if ann.faiss is None:
+        print("faiss not installed, skipping the HNSW backend")
+        return
+    start = time.perf_counter()
+    hnsw = ann.FaissIndex.build(gallery)
+    build_s = time.perf_counter() - start
+    for ef_search in (16, 32, 64, 128):
+        hnsw.index.hnsw.efSearch = ef_search
+        found, ms = timed(lambda q: hnsw.search(q, 1)[0][:, 0], probes, args.batch)
+        label = f'faiss hnsw ef={ef_search}'
+        print(f"{label:<26}{build_s:>10.2f}{ms:>10.3f}{np.mean(found == exact):>10.3f}{np.mean(found == truth):>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Throughput of the attendance path: sightings -> AttendanceWriter -> SQLite.
+
+Runs against a throw-away SQLite (WAL) database, so no MySQL server is needed.
+Usage: python -m benchmarks.attendance_benchmark --people 2000 --seconds 5
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app.attendance import AttendanceWriter, record_sighting
+from app.storage import SQLiteStorage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--people', type=int, default=2000, help='distinct people being seen')
+    parser.add_argument('--seconds', type=float, default=5.0, help='how long to generate sightings')
+    parser.add_argument('--window', type=float, default=1.0, help='writer flush window in seconds')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, 'attendance.db'))
+        writer = AttendanceWriter(storage, window=args.window).start()
+        attendance_data = {}
+        names = [f'PERSON {i}' for i in range(args.people)]
+        start_time = datetime(2025, 1, 1, 8)
+
+        sightings = 0
+        worst_submit = 0.0
+        started = time.perf_counter()
+        while time.perf_counter() - started < args.seconds:
+            name = names[sightings % len(names)]
+            current_time = start_time + timedelta(seconds=sightings / 100)
+            t0 = time.perf_counter()
+            writer.submit(name, record_sighting(attendance_data, name, current_time))
+            worst_submit = max(worst_submit, time.perf_counter() - t0)
+            sightings += 1
+        elapsed = time.perf_counter() - started
+
+        writer.stop()
+        rows = storage.query("SELECT COUNT(*) FROM attendance2")[0][0]
+        stats = writer.stats()
+        storage.close()
+
+    print(f"sightings            {sightings} ({sightings / elapsed:,.0f}/s on the recognition side)")
+    print(f"worst submit         {worst_submit * 1000:.3f} ms")
+    print(f"flushes              {stats['flushes']} (last {stats['last_flush_ms']} ms)")
+    print(f"rows written         {stats['rows_written']} ({sightings / max(stats['rows_written'], 1):.0f} sightings per row)")
+    print(f"attendance2 rows     {rows}")
+    print(f"dropped / errors     {stats['dropped']} / {stats['errors']}")
+
+
+if __name__ == '__main__':
+    main()
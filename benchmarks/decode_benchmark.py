@@ -0,0 +1,87 @@
+"""Time and memory per uploaded frame: full decode + resize vs app.ingest.decode_frame.
+
+Encodes a synthetic frame once, then decodes it repeatedly each way.
+Usage: python -m benchmarks.decode_benchmark --width 1280 --height 720 --runs 200
+"""
+import argparse
+import io
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from app.ingest import decode_frame
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def synthetic_frame(width, height, seed=0):
+    """A frame with smooth gradients and noise, so it compresses like camera footage."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([x / width * 255, y / height * 255, (x + y) / (width + height) * 255], axis=2)
+    noise = rng.normal(0, 12, (height, width, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def full_decode(data, scale):
+    """What /receive_frame did before: decode everything, then downscale and convert."""
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    imgS = cv2.resize(img, (0, 0), None, scale, scale)
+    return cv2.cvtColor(imgS, cv2.COLOR_BGR2RGB)
+
+
+def pil_decode(data, scale):
+    """What the /upload endpoint did before: PIL, numpy copy, two colour conversions."""
+    frame = cv2.cvtColor(np.array(Image.open(io.BytesIO(data))), cv2.COLOR_RGB2BGR)
+    imgS = cv2.resize(frame, (0, 0), None, scale, scale)
+    return cv2.cvtColor(imgS, cv2.COLOR_BGR2RGB)
+
+
+def measure(decode, data, scale, runs):
+    """Return (ms per frame, peak bytes allocated while decoding one frame)."""
+    decode(data, scale)
+    started = time.perf_counter()
+    for _ in range(runs):
+        decode(data, scale)
+    elapsed = (time.perf_counter() - started) / runs
+
+    tracemalloc.start()
+    decode(data, scale)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1000, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--quality', type=int, default=92, help='JPEG quality of the test frame')
+    parser.add_argument('--scale', type=float, default=0.25)
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    _, buffer = cv2.imencode('.jpg', synthetic_frame(args.width, args.height),
+                             [cv2.IMWRITE_JPEG_QUALITY, args.quality])
+    data = buffer.tobytes()
+    print(f"frame {args.width}x{args.height}, {len(data) / 1024:.0f} KiB JPEG, scale {args.scale}")
+
+    paths = [('full decode + resize', full_decode), ('decode_frame', decode_frame)]
+    if Image is not None:
+        paths.insert(0, ('PIL + resize', pil_decode))
+
+    baseline = None
+    for label, decode in paths:
+        ms, peak = measure(decode, data, args.scale, args.runs)
+        baseline = baseline or ms
+        print(f"{label:22s} {ms:7.2f} ms/frame  {baseline / ms:5.1f}x  peak {peak / 1024:7.0f} KiB  "
+              f"output {decode(data, args.scale).shape}")
+
+
+if __name__ == '__main__':
+    main()
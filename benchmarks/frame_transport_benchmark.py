@@ -0,0 +1,114 @@
+"""Frames per second and latency handing frames to another process: pickled Queue vs app.framering.FrameRing.
+
+A producer process writes frames as fast as it can; a consumer process
+reads the newest one, touches it and reports capture-to-receive latency.
+Usage: python -m benchmarks.frame_transport_benchmark --width 1280 --height 800 --seconds 5
+"""
+import argparse
+import multiprocessing
+import queue
+import time
+
+import numpy as np
+
+from app.framering import FrameRing
+
+
+def touch(frame):
+    """Stand-in for the consumer reading the frame: sum a sparse grid of pixels."""
+    return int(frame[::64, ::64].sum())
+
+
+def queue_producer(frames, out, stop):
+    i = 0
+    while not stop.is_set():
+        try:
+            out.put((time.monotonic(), frames[i % len(frames)]), timeout=0.1)
+        except queue.Full:
+            continue
+        i += 1
+    out.put(None)
+
+
+def queue_consumer(out, stop, report):
+    received, latencies = 0, []
+    # Drain up to the producer's None, so no frame is left half-sent when it exits
+    for item in iter(out.get, None):
+        if stop.is_set():
+            continue
+        captured_at, frame = item
+        latencies.append(time.monotonic() - captured_at)
+        touch(frame)
+        received += 1
+    report.put((received, latencies, 0))
+
+
+def ring_producer(frames, ring, stop):
+    i = 0
+    while not stop.is_set():
+        ring.write(frames[i % len(frames)])
+        i += 1
+    ring.close()
+
+
+def ring_consumer(ring, stop, report):
+    received, latencies, seq, frame = 0, [], 0, None
+    while not stop.is_set():
+        seq, frame, captured_at = ring.read_latest(seq, timeout=0.1)
+        if frame is None:
+            continue
+        latencies.append(time.monotonic() - captured_at)
+        touch(frame)
+        ring.release(seq)
+        received += 1
+    del frame
+    report.put((received, latencies, seq - received))
+    ring.close()
+
+
+def run(ctx, producer, consumer, transport, frames, seconds):
+    stop = ctx.Event()
+    report = ctx.Queue()
+    processes = [ctx.Process(target=consumer, args=(transport, stop, report)),
+                 ctx.Process(target=producer, args=(frames, transport, stop))]
+    for process in processes:
+        process.start()
+    time.sleep(seconds)
+    stop.set()
+    received, latencies, skipped = report.get()
+    for process in processes:
+        process.join()
+    return received / seconds, latencies, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=800)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--slots', type=int, default=4)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (args.height, args.width, 3), np.uint8) for _ in range(4)]
+    print(f"frame {args.width}x{args.height}x3 ({frames[0].nbytes / 2 ** 20:.1f} MiB), {args.seconds:.0f}s each")
+
+    ring = FrameRing(frames[0].shape, slots=args.slots, ctx=ctx)
+    try:
+        results = [
+            ('pickled Queue', run(ctx, queue_producer, queue_consumer, ctx.Queue(2), frames, args.seconds)),
+            ('FrameRing', run(ctx, ring_producer, ring_consumer, ring, frames, args.seconds)),
+        ]
+    finally:
+        ring.close()
+        ring.unlink()
+
+    for label, (fps, latencies, skipped) in results:
+        latencies = np.array(latencies) * 1000
+        print(f"{label:14s} {fps:8.1f} frames/s received  latency p50 {np.percentile(latencies, 50):6.2f} ms  "
+              f"p99 {np.percentile(latencies, 99):6.2f} ms  skipped {skipped}")
+
+
+if __name__ == '__main__':
+    main()
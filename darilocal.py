@@ -1,13 +1,20 @@
-from flask import Flask, jsonify, Response
+from flask import Flask, jsonify, request, Response
 import threading
 import cv2
-import numpy as np
-import face_recognition
 import os
-import mysql.connector
+import time
 from datetime import datetime
 from dotenv import load_dotenv
 import logging
+from app.capture import shared_capture
+from app import config
+from app.attendance import AttendanceState, AttendanceWriter, attendance_response
+from app.embeddings import unpack_embeddings
+from app.matcher import json_distance, load_matcher
+from app.motion import motion_gate_for
+from app.pipeline import FrameRecognizer, draw_results
+from app.reports import DailyRollup, ensure_schema, reports_blueprint
+from app.storage import open_storage
 
 # Load environment variables
 load_dotenv()
@@ -26,96 +33,69 @@ db_config = {
     'database': os.getenv('DB_NAME', 'keyperformance')
 }
 
-def connect_db():
-    return mysql.connector.connect(**db_config)
+# Pooled connections, reconnected automatically; DB_BACKEND=sqlite runs without MySQL
+storage = open_storage(db_config)
+ensure_schema(storage)
+app.register_blueprint(reports_blueprint(storage))
 
 # Load known faces
 path = 'lib/attendance'
-images = []
-classNames = []
 
 logging.info("Loading known faces...")
-for cls in os.listdir(path):
-    curImg = cv2.imread(f'{path}/{cls}')
-    if curImg is not None:
-        images.append(curImg)
-        classNames.append(os.path.splitext(cls)[0])
-
-encodeListKnown = [
-    face_recognition.face_encodings(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))[0] for img in images
-]
-logging.info(f"Loaded {len(classNames)} known faces.")
-
-attendance_data = {}
+matcher = load_matcher(path)
+logging.info(f"Loaded {len(matcher)} known faces.")
+
+# Attendance rows and daily rollups are batched and written off the recognition thread
+writer = AttendanceWriter(storage, rollup=DailyRollup(storage)).start()
+
+attendance = AttendanceState()
+
+# One decoder for the UDP stream, shared by recognition and /monitoring; it reconnects on its own
+STREAM_URL = "udp://0.0.0.0:12345"
+
+def open_stream():
+    return shared_capture(STREAM_URL, reconnect=True, ffmpeg_options=config.STREAM_FFMPEG_OPTIONS,
+                          decode_threads=config.STREAM_DECODE_THREADS)
+
 process_running = False
+capture = None
+recognizer = None
 
 def recognition_process():
-    global process_running, attendance_data
+    global process_running, capture, recognizer
 
     logging.info("Starting recognition process...")
     try:
-        conn = connect_db()
-        cursor = conn.cursor()
-
-        cap = cv2.VideoCapture("udp://0.0.0.0:12345")
-        if not cap.isOpened():
-            logging.error("UDP stream not accessible!")
-            process_running = False
-            return
+        cap = capture = open_stream()
+        recognizer = FrameRecognizer(matcher, gate=motion_gate_for(STREAM_URL))
 
         while True:
+            # Waits for the next frame (up to 5 s) rather than spinning
             success, img = cap.read()
             if not success:
-                logging.warning("Failed to read frame from UDP stream.")
+                if not cap.isOpened():
+                    logging.error("UDP stream ended.")
+                    break
+                logging.warning("No frame from UDP stream yet.")
                 continue
 
-            imgS = cv2.resize(img, (0, 0), None, 0.25, 0.25)
-            imgS = cv2.cvtColor(imgS, cv2.COLOR_BGR2RGB)
-            facesCurFrame = face_recognition.face_locations(imgS)
-            encodesCurFrame = face_recognition.face_encodings(imgS, facesCurFrame)
+            results = recognizer.process(img)
             current_time = datetime.now()
 
-            for encodeFace, faceLoc in zip(encodesCurFrame, facesCurFrame):
-                matches = face_recognition.compare_faces(encodeListKnown, encodeFace)
-                faceDis = face_recognition.face_distance(encodeListKnown, encodeFace)
-                matchIndex = np.argmin(faceDis)
-
-                if matches[matchIndex]:
-                    name = classNames[matchIndex].upper()
-                    if name in attendance_data:
-                        last_seen = attendance_data[name]['last_seen_time']
-                        if (current_time - last_seen).total_seconds() / 60.0 > 30:
-                            attendance_data[name]['discipline_status'] = 0
-                            cursor.execute("UPDATE attendance2 SET discipline_status = 0 WHERE name = %s", (name,))
-                        else:
-                            attendance_data[name]['discipline_status'] = 1
-                            working_hours = (current_time - attendance_data[name]['entry_time']).total_seconds() / 3600.0
-                            attendance_data[name]['working_hours'] = working_hours
-                            cursor.execute("UPDATE attendance2 SET working_hours = %s WHERE name = %s", (working_hours, name))
-                        attendance_data[name]['last_seen_time'] = current_time
-                    else:
-                        attendance_data[name] = {
-                            'entry_time': current_time,
-                            'last_seen_time': current_time,
-                            'discipline_status': 1,
-                            'working_hours': 0
-                        }
-                        cursor.execute(
-                            "INSERT INTO attendance2 (name, entry_time, last_seen_time, discipline_status, working_hours) VALUES (%s, %s, %s, %s, %s)",
-                            (name, current_time, current_time, 1, 0)
-                        )
-                    conn.commit()
+            for result in results:
+                if result.name is not None:
+                    name = result.name.upper()
+                    writer.submit(name, attendance.record(name, current_time), current_time)
+            cap.mark_result()
 
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
 
-        cap.release()
+        # The stream stays open for /monitoring
         cv2.destroyAllWindows()
     except Exception as e:
         logging.error(f"Error in recognition process: {e}")
     finally:
-        if conn.is_connected():
-            conn.close()
         process_running = False
         logging.info("Recognition process stopped.")
 
@@ -132,45 +112,93 @@ def start_recognition():
 
     return jsonify({"status": "success", "message": "Recognition process started."})
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Capture drops, capture-to-result latency, recognizer and writer counters."""
+    # The recognition thread opens the capture before it creates the recognizer
+    body = {"writer": writer.stats()}
+    if capture is not None:
+        body["capture"] = capture.stats()
+    if recognizer is not None:
+        body["recognizer"] = recognizer.stats()
+    return jsonify(body)
+
 @app.route('/attendance', methods=['GET'])
 def get_attendance():
-    return jsonify(attendance_data)
+    return attendance_response(attendance)
 
 @app.route('/reset', methods=['POST'])
 def reset_attendance():
-    global attendance_data
-    attendance_data = {}
+    attendance.reset()
     return jsonify({"status": "success", "message": "Attendance data reset."})
 
+@app.route('/embeddings', methods=['POST'])
+def receive_embeddings():
+    """Match face embeddings computed on an edge device and record attendance.
+
+    The body is one app.embeddings message (application/octet-stream), so
+    edge boxes send ~256-512 bytes per face instead of a video stream.
+    """
+    try:
+        camera_id, timestamp, boxes, encodings = unpack_embeddings(request.get_data())
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    # Trust the edge clock only while it roughly agrees with ours
+    if abs(time.time() - timestamp) > config.EMBEDDING_MAX_SKEW:
+        timestamp = time.time()
+    current_time = datetime.fromtimestamp(timestamp)
+
+    faces = []
+    for box, (name, distance) in zip(boxes.tolist(), matcher.identify(encodings)):
+        if name is not None:
+            name = name.upper()
+            writer.submit(name, attendance.record(name, current_time), current_time)
+        faces.append({"box": box, "name": name, "distance": json_distance(distance)})
+
+    return jsonify({"status": "success", "camera": camera_id, "faces": faces})
+
 @app.route('/monitoring', methods=['GET'])
 def monitoring_stream():
     """
     Endpoint untuk streaming video dengan deteksi wajah.
+
+    Draws the recognition loop's latest results (boxes, names, track ids)
+    instead of detecting again. ?width= and ?fps= override MONITOR_WIDTH
+    and MONITOR_FPS.
     """
-    def generate_frames():
-        cap = cv2.VideoCapture("udp://0.0.0.0:12345")
-        if not cap.isOpened():
-            logging.error("UDP stream not accessible for monitoring!")
-            yield b''
+    width = request.args.get('width', config.MONITOR_WIDTH, type=int)
+    fps = request.args.get('fps', config.MONITOR_FPS, type=float)
+    interval = 1.0 / fps if fps > 0 else 0.0
 
-        while True:
-            success, frame = cap.read()
-            if not success:
-                logging.warning("Failed to read frame for monitoring.")
-                break
+    def generate_frames():
+        cap = open_stream()
+        seq = 0
+        next_frame = time.monotonic()
+        while cap.isOpened():
+            # Cap the preview frame rate; frames in between are simply skipped
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_frame = max(next_frame + interval, time.monotonic())
+
+            seq, frame, _ = cap.read_latest(seq)
+            if frame is None:
+                continue
 
-            # Deteksi wajah
-            face_locations = face_recognition.face_locations(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            for (top, right, bottom, left) in face_locations:
-                cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+            # Resizing also copies, so the frame recognition reads is never drawn on
+            scale = width / frame.shape[1] if 0 < width < frame.shape[1] else 1.0
+            if scale < 1.0:
+                frame = cv2.resize(frame, (0, 0), None, scale, scale, interpolation=cv2.INTER_AREA)
+            else:
+                frame = frame.copy()
+            if recognizer is not None:
+                draw_results(frame, recognizer.last_results, scale, show_ids=True)
 
             # Encode frame ke format JPEG
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame = buffer.tobytes()
+            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, config.MONITOR_QUALITY])
             yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-
-        cap.release()
+                   b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
 
     return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
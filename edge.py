@@ -0,0 +1,67 @@
+"""Edge encoder: detect and encode faces next to the camera, send only embeddings.
+
+Usage: python edge.py --server http://SERVER:5000 --camera 0 --camera-id gate-1
+"""
+import argparse
+import logging
+import time
+import urllib.request
+
+import cv2
+import face_recognition
+
+from app.capture import LatestFrameCapture
+from app.embeddings import pack_embeddings
+from app.motion import motion_gate_for
+
+
+def send(url, message):
+    request = urllib.request.Request(url, data=message, headers={'Content-Type': 'application/octet-stream'})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', default='http://localhost:5000')
+    parser.add_argument('--camera', default='0', help='camera index or stream URL')
+    parser.add_argument('--camera-id', default=None, help='name reported to the server (default: --camera)')
+    parser.add_argument('--dtype', choices=('float32', 'float16'), default='float16')
+    parser.add_argument('--scale', type=float, default=0.25)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    source = int(args.camera) if args.camera.isdigit() else args.camera
+    camera_id = args.camera_id or args.camera
+    url = args.server.rstrip('/') + '/embeddings'
+    cap = LatestFrameCapture(source)
+    gate = motion_gate_for(source)
+
+    while True:
+        success, frame = cap.read()
+        if not success:
+            if not cap.isOpened():
+                logging.error("Camera %s ended.", args.camera)
+                break
+            continue
+        if not gate.should_process(frame):
+            continue
+
+        captured_at = time.time()
+        imgS = cv2.resize(frame, (0, 0), None, args.scale, args.scale)
+        imgS = cv2.cvtColor(imgS, cv2.COLOR_BGR2RGB)
+        locations = face_recognition.face_locations(imgS)
+        if not locations:
+            continue
+        encodings = face_recognition.face_encodings(imgS, locations)
+        boxes = [[int(v / args.scale) for v in location] for location in locations]
+        try:
+            logging.info(send(url, pack_embeddings(camera_id, captured_at, boxes, encodings, args.dtype)).decode())
+        except OSError as e:
+            logging.warning("Sending embeddings failed: %s", e)
+
+    cap.release()
+
+
+if __name__ == '__main__':
+    main()
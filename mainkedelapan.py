@@ -1,37 +1,22 @@
-from flask import Flask, Response, jsonify
-import cv2
-import face_recognition
-import os
+from flask import Flask, Response, jsonify, request
+from app.capture import LatestFrameCapture
+from app.hub import FrameHub, mjpeg_stream
+from app.matcher import load_matcher
+from app.motion import motion_gate_for
+from app.pipeline import CameraPipeline, FrameRecognizer
 
 app = Flask(__name__)
 
 # Load known faces
 path = 'lib/attendance'
-images = [cv2.imread(f'{path}/{cls}') for cls in os.listdir(path) if cls]
-classNames = [os.path.splitext(cls)[0] for cls in os.listdir(path)]
-encodeListKnown = [face_recognition.face_encodings(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))[0] for img in images]
-
-cap = cv2.VideoCapture(0)
-
-def generate_frames():
-    while True:
-        success, frame = cap.read()
-        if not success: break
-        imgS = cv2.resize(frame, (0, 0), None, 0.25, 0.25)
-        imgS = cv2.cvtColor(imgS, cv2.COLOR_BGR2RGB)
-        facesCurFrame = face_recognition.face_locations(imgS)
-        encodesCurFrame = face_recognition.face_encodings(imgS, facesCurFrame)
-        for encodeFace, faceLoc in zip(encodesCurFrame, facesCurFrame):
-            matches = face_recognition.compare_faces(encodeListKnown, encodeFace)
-            matchIndex = matches.index(True) if True in matches else -1
-            if matchIndex != -1:
-                name = classNames[matchIndex].upper()
-                top, right, bottom, left = [v * 4 for v in faceLoc]
-                cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-                cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 50])
-        frame = buffer.tobytes()
-        yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+matcher = load_matcher(path)
+recognizer = FrameRecognizer(matcher, gate=motion_gate_for(0))
+
+cap = LatestFrameCapture(0)
+
+# One recognition pipeline shared by every viewer
+hub = FrameHub()
+pipeline = CameraPipeline(cap, recognizer, hub, quality=50).start()
 
 @app.route('/')
 def index():
@@ -39,7 +24,11 @@ def index():
 
 @app.route('/stream')
 def stream():
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(mjpeg_stream(hub, request.args.get('rung', type=int)), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/stats')
+def stats():
+    return jsonify(pipeline.stats())
 
 @app.route('/attendance')
 def attendance():
@@ -1,10 +1,11 @@
-from flask import Flask, Response, jsonify
-import cv2
-import numpy as np
-import face_recognition
-import os
+from flask import Flask, Response, jsonify, request
 import mysql.connector
 from datetime import datetime
+from app.capture import LatestFrameCapture
+from app.hub import FrameHub, mjpeg_stream
+from app.matcher import load_matcher
+from app.motion import motion_gate_for
+from app.pipeline import CameraPipeline, FrameRecognizer
 
 # Flask setup
 app = Flask(__name__)
@@ -16,58 +17,25 @@ cursor = conn.cursor()
 
 # Load known faces
 path = 'lib/attendance'
-images = []
-classNames = []
-for cls in os.listdir(path):
-    curImg = cv2.imread(f'{path}/{cls}')
-    if curImg is not None:
-        images.append(curImg)
-        classNames.append(os.path.splitext(cls)[0])
-encodeListKnown = [face_recognition.face_encodings(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))[0] for img in images]
+matcher = load_matcher(path)
+recognizer = FrameRecognizer(matcher, gate=motion_gate_for(0))
 
 attendance_data = {}
-cap = cv2.VideoCapture(0)
+cap = LatestFrameCapture(0)
 
-def generate_frames():
-    while True:
-        success, frame = cap.read()
-        if not success:
-            break
-        
-        # Resize frame for faster processing
-        imgS = cv2.resize(frame, (0, 0), None, 0.25, 0.25)
-        imgS = cv2.cvtColor(imgS, cv2.COLOR_BGR2RGB)
-        
-        # Face detection and recognition
-        facesCurFrame = face_recognition.face_locations(imgS)
-        encodesCurFrame = face_recognition.face_encodings(imgS, facesCurFrame)
-        
-        for encodeFace, faceLoc in zip(encodesCurFrame, facesCurFrame):
-            matches = face_recognition.compare_faces(encodeListKnown, encodeFace)
-            faceDis = face_recognition.face_distance(encodeListKnown, encodeFace)
-            matchIndex = np.argmin(faceDis)
-            
-            if matches[matchIndex]:
-                name = classNames[matchIndex].upper()
-                top, right, bottom, left = [v * 4 for v in faceLoc]  # Scale back to original size
-                cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-                cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-            else:
-                top, right, bottom, left = [v * 4 for v in faceLoc]  # Scale back to original size
-                cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
-                cv2.putText(frame, "Unknown", (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-        
-        # Encode the frame in JPEG format
-        _, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
-        
-        # Yield the frame as part of an MJPEG stream
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+# One recognition pipeline for the camera, shared by every /stream viewer
+hub = FrameHub()
+pipeline = CameraPipeline(cap, recognizer, hub, quality=95).start()
 
 @app.route('/stream', methods=['GET'])
 def stream():
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    """?rung=0 (best) .. 2 pins the quality, otherwise it adapts to the viewer's bandwidth."""
+    return Response(mjpeg_stream(hub, request.args.get('rung', type=int)), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Capture drops, capture-to-result latency, recognizer counters and viewers."""
+    return jsonify(pipeline.stats())
 
 @app.route('/attendance', methods=['GET'])
 def get_attendance():
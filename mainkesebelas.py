@@ -1,21 +1,17 @@
 from flask import Flask, request, jsonify
-import cv2
+from flask_sock import Sock
 import face_recognition
-import numpy as np
-import os
-from PIL import Image
-import io
+import json
+from app.ingest import decode_frame
+from app.matcher import load_matcher
 
 app = Flask(__name__)
+# Binary WebSocket channel for frames (needs flask-sock)
+sock = Sock(app)
 
 # Load known faces
 path = 'lib/attendance'
-images = [cv2.imread(f'{path}/{cls}') for cls in os.listdir(path) if cls]
-classNames = [os.path.splitext(cls)[0] for cls in os.listdir(path)]
-encodeListKnown = [
-    face_recognition.face_encodings(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))[0]
-    for img in images if img is not None
-]
+matcher = load_matcher(path)
 
 @app.route('/')
 def index():
@@ -44,58 +40,82 @@ def index():
                     console.error("Error accessing camera:", error);
                 });
 
-            // Send frames to the server every 100ms
-            setInterval(() => {
+            // Frames go over one WebSocket as binary JPEG messages; results come back on it.
+            // The next frame is sent 100ms after the previous result, so frames never pile up.
+            const scheme = location.protocol === 'https:' ? 'wss://' : 'ws://';
+            const socket = new WebSocket(scheme + location.host + '/ws');
+
+            function sendFrame() {
+                if (!video.videoWidth) {
+                    setTimeout(sendFrame, 100);
+                    return;
+                }
                 canvas.width = video.videoWidth;
                 canvas.height = video.videoHeight;
                 ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
 
                 // Convert frame to JPEG and send to server
-                canvas.toBlob((blob) => {
-                    fetch('/upload', {
-                        method: 'POST',
-                        body: blob,
-                        headers: {
-                            'Content-Type': 'image/jpeg'
-                        }
-                    }).catch(err => console.error("Error sending frame:", err));
-                }, 'image/jpeg');
-            }, 100); // Interval in milliseconds
+                canvas.toBlob((blob) => socket.send(blob), 'image/jpeg');
+            }
+
+            socket.onopen = () => sendFrame();
+            socket.onmessage = (event) => {
+                const result = JSON.parse(event.data);
+                if (result.status !== 'success') {
+                    console.error("Error processing frame:", result.message);
+                } else if (result.faces.length) {
+                    console.log(result.faces);
+                }
+                setTimeout(sendFrame, 100);
+            };
+            socket.onclose = () => console.error("Frame channel closed");
         </script>
     </body>
     </html>
     """
 
+def recognize_jpeg(data):
+    """Return [{name, box}] for every face in an encoded image; unknown faces have name None."""
+    # Decode straight to quarter resolution RGB
+    imgS = decode_frame(data)
+    if imgS is None:
+        raise ValueError("Invalid image")
+    facesCurFrame = face_recognition.face_locations(imgS)
+    encodesCurFrame = face_recognition.face_encodings(imgS, facesCurFrame)
+
+    faces = []
+    for (name, _), faceLoc in zip(matcher.identify(encodesCurFrame), facesCurFrame):
+        if name is not None:
+            name = name.upper()
+            print(f"Detected: {name}")
+        else:
+            print("Unknown face detected")
+        faces.append({"name": name, "box": [v * 4 for v in faceLoc]})
+    return faces
+
 @app.route('/upload', methods=['POST'])
 def upload():
     """Receive frames from the client and process them."""
     try:
-        # Get the image from the request
-        img_bytes = io.BytesIO(request.data)
-        img = Image.open(img_bytes)
-
-        # Convert image to OpenCV format
-        frame = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-
-        # Resize and process the frame for face recognition
-        imgS = cv2.resize(frame, (0, 0), None, 0.25, 0.25)
-        imgS = cv2.cvtColor(imgS, cv2.COLOR_BGR2RGB)
-        facesCurFrame = face_recognition.face_locations(imgS)
-        encodesCurFrame = face_recognition.face_encodings(imgS, facesCurFrame)
-
-        for encodeFace, faceLoc in zip(encodesCurFrame, facesCurFrame):
-            matches = face_recognition.compare_faces(encodeListKnown, encodeFace)
-            matchIndex = matches.index(True) if True in matches else -1
-            if matchIndex != -1:
-                name = classNames[matchIndex].upper()
-                print(f"Detected: {name}")
-            else:
-                print("Unknown face detected")
-
+        recognize_jpeg(request.data)
         return jsonify({"status": "success"})
     except Exception as e:
         print(f"Error processing frame: {e}")
         return jsonify({"status": "error", "message": str(e)}), 400
 
+@sock.route('/ws')
+def frames(ws):
+    """Each binary message is a JPEG frame; each reply is its JSON result."""
+    while True:
+        data = ws.receive()
+        if isinstance(data, str):
+            continue
+        try:
+            reply = {"status": "success", "faces": recognize_jpeg(data)}
+        except Exception as e:
+            print(f"Error processing frame: {e}")
+            reply = {"status": "error", "message": str(e)}
+        ws.send(json.dumps(reply))
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
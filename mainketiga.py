@@ -1,11 +1,10 @@
 from flask import Flask, request, jsonify
 import threading
 import cv2
-import numpy as np
 import face_recognition
-import os
 import mysql.connector
 from datetime import datetime
+from app.matcher import load_matcher
 
 # Flask setup
 app = Flask(__name__)
@@ -17,14 +16,7 @@ cursor = conn.cursor()
 
 # Load known faces
 path = 'lib/attendance'
-images = []
-classNames = []
-for cls in os.listdir(path):
-    curImg = cv2.imread(f'{path}/{cls}')
-    if curImg is not None:
-        images.append(curImg)
-        classNames.append(os.path.splitext(cls)[0])
-encodeListKnown = [face_recognition.face_encodings(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))[0] for img in images]
+matcher = load_matcher(path)
 
 attendance_data = {}
 process_running = False
@@ -57,13 +49,9 @@ def recognition_process():
         encodesCurFrame = face_recognition.face_encodings(imgS, facesCurFrame)
         current_time = datetime.now()
 
-        for encodeFace, faceLoc in zip(encodesCurFrame, facesCurFrame):
-            matches = face_recognition.compare_faces(encodeListKnown, encodeFace)
-            faceDis = face_recognition.face_distance(encodeListKnown, encodeFace)
-            matchIndex = np.argmin(faceDis)
-
-            if matches[matchIndex]:
-                name = classNames[matchIndex].upper()
+        for (name, _), faceLoc in zip(matcher.identify(encodesCurFrame), facesCurFrame):
+            if name is not None:
+                name = name.upper()
                 if name in attendance_data:
                     last_seen = attendance_data[name]['last_seen_time']
                     if (current_time - last_seen).total_seconds() / 60.0 > 30:
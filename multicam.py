@@ -0,0 +1,70 @@
+from flask import Flask, jsonify
+import logging
+import os
+from datetime import datetime
+from app.attendance import AttendanceState, AttendanceWriter, attendance_response
+from app import config
+from app.cameras import CameraRegistry, cameras_blueprint
+from app.matcher import load_matcher
+from app.reports import DailyRollup, ensure_schema, reports_blueprint
+from app.scheduler import CameraScheduler
+from app.storage import open_storage
+
+# Flask setup
+app = Flask(__name__)
+
+# Recognition runs in spawned worker processes, which import this module again;
+# everything that starts threads, processes or connections lives in main()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+
+    # Database setup
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USER', 'root'),
+        'password': os.getenv('DB_PASSWORD', ''),
+        'database': os.getenv('DB_NAME', 'keyperformance')
+    }
+    storage = open_storage(db_config)
+    ensure_schema(storage)
+
+    # Refresh the gallery cache and ANN index here, once, before any thread starts:
+    # encoding new photos forks this process. Workers get the result.
+    matcher = load_matcher(config.GALLERY_PATH)
+
+    writer = AttendanceWriter(storage, rollup=DailyRollup(storage)).start()
+    attendance = AttendanceState()
+
+    def record(camera_id, timestamp, faces):
+        """Record attendance for every known face any camera recognized."""
+        current_time = datetime.fromtimestamp(timestamp)
+        for _, _, name, _ in faces:
+            if name is not None:
+                name = name.upper()
+                writer.submit(name, attendance.record(name, current_time), current_time)
+
+    # Cameras come from cameras.json (see app.cameras) and can be changed over /cameras
+    registry = CameraRegistry()
+    scheduler = CameraScheduler(registry, (matcher.names, matcher.encodings), on_result=record).start()
+    logging.info(f"Scheduling {len(registry.enabled())} cameras on up to {scheduler.workers} workers.")
+
+    app.register_blueprint(cameras_blueprint(registry, scheduler))
+    app.register_blueprint(reports_blueprint(storage))
+
+    @app.route('/attendance', methods=['GET'])
+    def get_attendance():
+        return attendance_response(attendance)
+
+    @app.route('/stats', methods=['GET'])
+    def stats():
+        """Workers, per-camera health and the attendance writer."""
+        return jsonify({"scheduler": scheduler.stats(), "writer": writer.stats(),
+                        "cameras": {camera['id']: scheduler.camera_status(camera['id']) for camera in registry.list()}})
+
+    app.run(host='0.0.0.0', port=5000, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
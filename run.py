@@ -1,4 +1,4 @@
-from app import create_app
+from app import config, create_app
 import logging
 
 app = create_app()
@@ -6,4 +6,4 @@ app = create_app()
 if __name__ == '__main__':
     from waitress import serve
     logging.basicConfig(level=logging.INFO)
-    serve(app, host='0.0.0.0', port=5000)
+    serve(app, host='0.0.0.0', port=5000, threads=config.WSGI_THREADS)
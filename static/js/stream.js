@@ -1,5 +1,17 @@
 const video = document.getElementById('localVideo');
 
+// Identifies this tab to the server's flow control
+const clientId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : String(Math.random()).slice(2);
+
+// Frame rate advised by the server; updated from every reply
+let targetFps = 5;
+
+// With ?crop in the URL and a browser that has the FaceDetector API, faces are found
+// here and only padded face chips are uploaded to /receive_faces
+const CHIP_PADDING = 0.25;
+const faceDetector = (new URLSearchParams(location.search).has('crop') && 'FaceDetector' in window)
+    ? new FaceDetector({ fastMode: true, maxDetectedFaces: 8 }) : null;
+
 // Access local camera
 navigator.mediaDevices.getUserMedia({ video: true, audio: false })
     .then(stream => {
@@ -9,33 +21,161 @@ navigator.mediaDevices.getUserMedia({ video: true, audio: false })
         const canvas = document.createElement('canvas');
         const context = canvas.getContext('2d');
 
+        // Frames go over the /ws/frames WebSocket when the server offers it, else one POST each
+        let socket = null;
+        let started = 0;
+        let awaitingReply = false;
+
+        function scheduleNext(delay) {
+            setTimeout(sendFrame, Math.max(0, delay));
+        }
+
+        // Handle one reply; only one frame is ever outstanding, the next is sent from here
+        function handleResult(status, data) {
+            awaitingReply = false;
+            if (data.flow && data.flow.fps > 0) {
+                targetFps = data.flow.fps;
+            }
+            if (status === 429 || data.retry_after_ms) {
+                scheduleNext(data.retry_after_ms || 1000);
+                return;
+            }
+            console.log(data);
+            scheduleNext(1000 / targetFps - (performance.now() - started));
+        }
+
+        function postFrame(blob) {
+            const formData = new FormData();
+            formData.append('frame', blob);
+
+            // POST frame to Flask server
+            fetch('/receive_frame', {
+                method: 'POST',
+                headers: { 'X-Client-Id': clientId },
+                body: formData
+            })
+            .then(response => response.json().then(data => handleResult(response.status, data)))
+            .catch(err => {
+                console.error(err);
+                awaitingReply = false;
+                scheduleNext(1000);
+            });
+        }
+
         function sendFrame() {
+            if (faceDetector) {
+                sendFaces();
+            } else {
+                sendFullFrame();
+            }
+        }
+
+        // Crop one face with CHIP_PADDING on every side; parts outside the frame stay black
+        const chipCanvas = document.createElement('canvas');
+        const chipContext = chipCanvas.getContext('2d');
+
+        function cropFace(box) {
+            const padX = box.width * CHIP_PADDING;
+            const padY = box.height * CHIP_PADDING;
+            const left = Math.round(box.left - padX);
+            const top = Math.round(box.top - padY);
+            chipCanvas.width = Math.round(box.width + 2 * padX);
+            chipCanvas.height = Math.round(box.height + 2 * padY);
+            chipContext.fillRect(0, 0, chipCanvas.width, chipCanvas.height);
+
+            const sx = Math.max(0, left);
+            const sy = Math.max(0, top);
+            const sw = Math.min(video.videoWidth, left + chipCanvas.width) - sx;
+            const sh = Math.min(video.videoHeight, top + chipCanvas.height) - sy;
+            chipContext.drawImage(video, sx, sy, sw, sh, sx - left, sy - top, sw, sh);
+            return new Promise(resolve => chipCanvas.toBlob(resolve, 'image/jpeg'));
+        }
+
+        function sendFaces() {
+            started = performance.now();
+            faceDetector.detect(video)
+                .then(faces => {
+                    if (!faces.length) {
+                        scheduleNext(1000 / targetFps);
+                        return;
+                    }
+                    const boxes = faces.map(face => face.boundingBox);
+                    // Crop one after another: they share chipCanvas
+                    return boxes.reduce((chips, box) => chips.then(list => cropFace(box).then(blob => list.concat([blob]))),
+                                        Promise.resolve([]))
+                        .then(chips => {
+                            const formData = new FormData();
+                            chips.forEach(blob => formData.append('face', blob));
+                            formData.append('boxes', JSON.stringify(boxes.map(box =>
+                                [box.top, box.right, box.bottom, box.left].map(Math.round))));
+                            formData.append('padding', CHIP_PADDING);
+
+                            awaitingReply = true;
+                            return fetch('/receive_faces', {
+                                method: 'POST',
+                                headers: { 'X-Client-Id': clientId },
+                                body: formData
+                            })
+                            .then(response => response.json().then(data => handleResult(response.status, data)));
+                        });
+                })
+                .catch(err => {
+                    console.error(err);
+                    awaitingReply = false;
+                    scheduleNext(1000);
+                });
+        }
+
+        function sendFullFrame() {
+            started = performance.now();
             canvas.width = video.videoWidth;
             canvas.height = video.videoHeight;
             context.drawImage(video, 0, 0, canvas.width, canvas.height);
 
             // Convert frame to blob
             canvas.toBlob(blob => {
-                const formData = new FormData();
-                formData.append('frame', blob);
-
-                // POST frame to Flask server
-                fetch('/receive_frame', {
-                    method: 'POST',
-                    body: formData
-                })
-                .then(response => response.json())
-                .then(data => {
-                    console.log(data);
-                })
-                .catch(err => console.error(err));
+                awaitingReply = true;
+                if (socket && socket.readyState === WebSocket.OPEN) {
+                    socket.send(blob);
+                } else {
+                    postFrame(blob);
+                }
             }, 'image/jpeg');
+        }
 
-            requestAnimationFrame(sendFrame);
+        function openSocket() {
+            const scheme = location.protocol === 'https:' ? 'wss://' : 'ws://';
+            const ws = new WebSocket(scheme + location.host + '/ws/frames');
+            ws.binaryType = 'arraybuffer';
+            ws.onopen = () => {
+                socket = ws;
+                sendFrame();
+            };
+            ws.onmessage = event => handleResult(200, JSON.parse(event.data));
+            ws.onerror = () => {
+                // No WebSocket endpoint (e.g. plain waitress): fall back to POSTs
+                if (socket === null) {
+                    sendFrame();
+                }
+            };
+            ws.onclose = () => {
+                if (socket === ws) {
+                    socket = null;
+                    // A frame lost with the connection would otherwise stall the loop
+                    if (awaitingReply) {
+                        awaitingReply = false;
+                        scheduleNext(1000);
+                    }
+                }
+            };
         }
 
         video.onloadedmetadata = () => {
-            sendFrame();
+            if (faceDetector) {
+                sendFrame();
+            } else {
+                openSocket();
+            }
         };
     })
     .catch(err => console.error('Error accessing camera:', err));
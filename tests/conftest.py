@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# app.config is read once at import: always point the gallery at an empty directory
+# first, even when GALLERY_PATH is set in the developer's environment
+os.environ['GALLERY_PATH'] = os.path.join(tempfile.mkdtemp(), 'attendance')
+os.makedirs(os.environ['GALLERY_PATH'])
@@ -0,0 +1,108 @@
+"""AttendanceWriter: coalescing, flush order, requeue after failure and the pending cap."""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.attendance import ABSENT_SQL, HOURS_SQL, INSERT_SQL, AttendanceWriter, record_sighting
+from app.storage import SQLiteStorage
+
+T0 = datetime(2026, 3, 2, 8, 0, 0)
+
+
+class RecordingStorage:
+    """Records each transaction's executemany calls; fails the next `fail` transactions."""
+
+    def __init__(self):
+        self.transactions = []
+        self.fail = 0
+
+    @contextmanager
+    def transaction(self):
+        calls = []
+        storage = self
+
+        class Cursor:
+            def executemany(self, sql, rows):
+                calls.append((sql, [tuple(row) for row in rows]))
+
+        yield Cursor()
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("database is down")
+        storage.transactions.append(calls)
+
+
+@pytest.fixture
+def sqlite(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'attendance.db'), pool_size=1)
+    yield storage
+    storage.close()
+
+
+def sightings(writer, records, name, *times):
+    for seen_at in times:
+        writer.submit(name, record_sighting(records, name, seen_at), seen_at)
+
+
+def test_changes_for_one_person_coalesce_into_the_insert():
+    storage = RecordingStorage()
+    writer = AttendanceWriter(storage)
+    records = {}
+    sightings(writer, records, 'ANA', T0, T0 + timedelta(minutes=30), T0 + timedelta(hours=1))
+    writer.flush()
+
+    assert storage.transactions == [[(INSERT_SQL, [('ANA', T0, T0, 1, 1.0)])]]
+
+
+def test_flush_writes_inserts_before_updates():
+    storage = RecordingStorage()
+    writer = AttendanceWriter(storage)
+    records = {}
+    sightings(writer, records, 'ANA', T0)
+    sightings(writer, records, 'BUDI', T0)
+    writer.flush()
+    sightings(writer, records, 'BUDI', T0 + timedelta(minutes=45))
+    sightings(writer, records, 'ANA', T0 + timedelta(minutes=15))
+    sightings(writer, records, 'CITRA', T0 + timedelta(minutes=15))
+    writer.flush()
+
+    assert [sql for sql, _ in storage.transactions[1]] == [INSERT_SQL, ABSENT_SQL, HOURS_SQL]
+    assert storage.transactions[1][1] == (ABSENT_SQL, [('BUDI',)])
+    assert storage.transactions[1][2] == (HOURS_SQL, [(0.25, 'ANA')])
+
+
+def test_failed_flush_is_requeued_under_newer_changes():
+    storage = RecordingStorage()
+    writer = AttendanceWriter(storage)
+    records = {}
+    sightings(writer, records, 'ANA', T0)
+    storage.fail = 1
+    writer.flush()
+    assert writer.errors == 1 and storage.transactions == []
+
+    sightings(writer, records, 'ANA', T0 + timedelta(minutes=10))
+    writer.flush()
+
+    hours = 10 / 60.0
+    assert storage.transactions == [[(INSERT_SQL, [('ANA', T0, T0, 1, hours)])]]
+
+
+def test_full_queue_drops_updates_but_never_inserts(sqlite):
+    writer = AttendanceWriter(sqlite, max_pending=2)
+    records = {}
+    sightings(writer, records, 'ANA', T0)
+    sightings(writer, records, 'BUDI', T0)
+    sightings(writer, records, 'CITRA', T0)
+    assert writer.stats()['pending'] == 3
+    assert writer.stats()['dropped'] == 0
+
+    writer.flush()
+    rows = sqlite.query("SELECT name FROM attendance2 ORDER BY name")
+    assert [row[0] for row in rows] == ['ANA', 'BUDI', 'CITRA']
+
+    # Refill to the cap; an update for a name not already pending is dropped and counted
+    sightings(writer, records, 'DEWI', T0)
+    sightings(writer, records, 'EKA', T0)
+    assert not writer.submit('ANA', record_sighting(records, 'ANA', T0 + timedelta(minutes=5)))
+    assert writer.stats()['dropped'] == 1
@@ -0,0 +1,80 @@
+"""FEMB messages: round trip and every rejection path."""
+import struct
+
+import numpy as np
+import pytest
+
+from app.embeddings import HEADER, MAX_FACES, pack_embeddings, unpack_embeddings
+
+BOXES = [[10, 60, 70, 5], [100, 180, 190, 90]]
+
+
+def _encodings(n=2):
+    return np.random.default_rng(0).normal(0, 0.1, (n, 128)).astype(np.float32)
+
+
+@pytest.mark.parametrize('dtype, atol', [('float32', 0), ('float16', 1e-3)])
+def test_round_trip(dtype, atol):
+    encodings = _encodings()
+    camera_id, timestamp, boxes, decoded = unpack_embeddings(
+        pack_embeddings('pintu-1', 1767225600.5, BOXES, encodings, dtype))
+    assert camera_id == 'pintu-1'
+    assert timestamp == 1767225600.5
+    assert boxes.tolist() == BOXES
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, encodings, atol=atol)
+
+
+def test_no_faces():
+    _, _, boxes, encodings = unpack_embeddings(pack_embeddings('cam', 1767225600.0, [], []))
+    assert boxes.shape == (0, 4) and encodings.shape == (0, 128)
+
+
+def _with_header(message, **fields):
+    values = dict(zip(('magic', 'version', 'dtype', 'count', 'dim', 'id_length', 'timestamp'),
+                      HEADER.unpack_from(message)))
+    values.update(fields)
+    return HEADER.pack(*values.values()) + message[HEADER.size:]
+
+
+@pytest.mark.parametrize('change, message', [
+    (dict(magic=b'JPEG'), "Not an embeddings message"),
+    (dict(version=2), "Unsupported version"),
+    (dict(dtype=7), "Unknown dtype"),
+    (dict(dim=512), "Expected 128-d"),
+    (dict(count=MAX_FACES + 1), "At most"),
+    (dict(count=3), "does not match"),
+    (dict(timestamp=float('nan')), "Timestamp"),
+    (dict(timestamp=float('inf')), "Timestamp"),
+    (dict(timestamp=-1.0), "Timestamp"),
+    (dict(timestamp=1e300), "Timestamp"),
+])
+def test_rejects_bad_headers(change, message):
+    packed = pack_embeddings('cam', 1767225600.0, BOXES, _encodings())
+    with pytest.raises(ValueError, match=message):
+        unpack_embeddings(_with_header(packed, **change))
+
+
+def test_rejects_short_and_truncated_messages():
+    packed = pack_embeddings('cam', 1767225600.0, BOXES, _encodings())
+    with pytest.raises(ValueError, match="too short"):
+        unpack_embeddings(packed[:HEADER.size - 1])
+    with pytest.raises(ValueError, match="does not match"):
+        unpack_embeddings(packed[:-1])
+
+
+def test_rejects_bad_camera_id_and_non_finite_embeddings():
+    packed = pack_embeddings('ab', 1767225600.0, BOXES, _encodings())
+    with pytest.raises(ValueError, match="UTF-8"):
+        unpack_embeddings(packed[:HEADER.size] + b'\xff\xfe' + packed[HEADER.size + 2:])
+
+    encodings = _encodings()
+    encodings[1, 7] = np.nan
+    with pytest.raises(ValueError, match="finite"):
+        unpack_embeddings(pack_embeddings('cam', 1767225600.0, BOXES, encodings))
+
+
+def test_pack_needs_one_box_per_embedding():
+    with pytest.raises(ValueError):
+        pack_embeddings('cam', 1767225600.0, BOXES[:1], _encodings())
+    assert struct.calcsize('<4sBBHHHd') == HEADER.size
@@ -0,0 +1,36 @@
+"""Replies stay valid JSON when nobody is enrolled and every distance is inf."""
+import io
+import json
+
+import cv2
+import numpy as np
+
+from app import routes
+from app.matcher import FaceMatcher
+
+
+def _strict_json(text):
+    def reject(constant):
+        raise ValueError(f"{constant} is not valid JSON")
+    return json.loads(text, parse_constant=reject)
+
+
+def test_face_results_without_gallery():
+    matches = FaceMatcher([], np.zeros((0, 128))).identify(np.zeros((2, 128)))
+    faces = routes.face_results([(0, 40, 40, 0), (0, 80, 40, 40)], matches, scale=1.0)
+    assert [face['distance'] for face in faces] == [None, None]
+    assert [face['name'] for face in faces] == [None, None]
+    json.dumps(faces, allow_nan=False)
+
+
+def test_receive_faces_without_gallery():
+    assert len(routes.matcher) == 0
+    _, chip = cv2.imencode('.jpg', np.zeros((64, 64, 3), np.uint8))
+    response = routes.app.test_client().post('/receive_faces', data={
+        'face': (io.BytesIO(chip.tobytes()), 'face.jpg'),
+        'boxes': json.dumps([[0, 64, 64, 0]]),
+    })
+    assert response.status_code == 200
+    body = _strict_json(response.get_data(as_text=True))
+    assert body['name'] == "Unknown"
+    assert body['faces'][0]['distance'] is None
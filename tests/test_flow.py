@@ -0,0 +1,38 @@
+"""FlowController admission, 429 bodies and frame-rate advice."""
+import math
+
+from app.flow import FlowController
+
+
+def test_refuses_beyond_the_limit_until_a_frame_finishes():
+    flow = FlowController(capacity=2, limit=2)
+    tokens = [flow.start('a'), flow.start('b')]
+    assert None not in tokens
+    assert flow.start('c') is None
+    assert flow.stats()['throttled'] == 1
+
+    flow.finish(tokens[0])
+    assert flow.start('c') is not None
+    assert flow.stats()['accepted'] == 3
+
+
+def test_busy_response_carries_retry_after():
+    flow = FlowController(capacity=1, limit=1, min_fps=0.5, max_fps=10)
+    flow._service_time = 1.5
+    body, headers = flow.busy_response()
+    retry = 1.0 / flow.target_fps()
+    assert body['retry_after_ms'] == round(retry * 1000)
+    assert headers['Retry-After'] == str(max(1, math.ceil(retry)))
+    assert body['flow']['fps'] == round(flow.target_fps(), 2)
+
+
+def test_target_fps_splits_capacity_between_clients_and_is_clamped():
+    flow = FlowController(capacity=4, limit=4, min_fps=1, max_fps=15)
+    assert flow.target_fps() == 15
+    flow._service_time = 0.1
+    for client in ('a', 'b', 'c', 'd'):
+        flow.start(client)
+    # 4 workers / 0.1 s per frame = 40 fps over 4 clients
+    assert flow.target_fps() == 10
+    flow._service_time = 10.0
+    assert flow.target_fps() == 1
@@ -0,0 +1,96 @@
+"""FrameRing: views, pinning, overwrite order, drop counting and cross-process reads."""
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from app.framering import FrameRing
+
+SHAPE = (4, 6, 3)
+
+
+def _frame(value):
+    return np.full(SHAPE, value, np.uint8)
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(SHAPE, slots=3)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def test_read_latest_returns_a_read_only_view_of_the_newest_frame(ring):
+    assert ring.write(_frame(1)) == 1
+    assert ring.write(_frame(2)) == 2
+    seq, frame, captured_at = ring.read_latest(0, timeout=0)
+    assert seq == 2 and captured_at > 0
+    assert (frame == 2).all()
+    assert np.shares_memory(frame, ring._frames)
+    assert not frame.flags.writeable
+    ring.release(seq)
+
+    assert ring.read_latest(seq, timeout=0) == (seq, None, None)
+
+
+def test_pinned_frame_is_never_overwritten(ring):
+    ring.write(_frame(7))
+    seq, frame, _ = ring.read_latest(0, timeout=0)
+    for value in range(20, 40):
+        ring.write(_frame(value))
+    assert (frame == 7).all()
+    assert ring.stats()['pinned'] == 1
+    ring.release(seq)
+    del frame
+
+    for value in range(40, 43):
+        ring.write(_frame(value))
+    seq, frame, _ = ring.read_latest(0, timeout=0)
+    assert (frame == 42).all()
+    ring.release(seq)
+
+
+def test_writes_are_dropped_and_counted_when_every_other_slot_is_pinned(ring):
+    pinned = []
+    for value in range(2):
+        ring.write(_frame(value))
+        pinned.append(ring.read_latest(pinned[-1] if pinned else 0, timeout=0)[0])
+    # One slot is left and holds the newest frame, which the writer never reuses
+    ring.write(_frame(5))
+    seq, _, _ = ring.read_latest(pinned[-1], timeout=0)
+    assert ring.write(_frame(6)) is None
+    assert ring.stats() == {"slots": 3, "written": 3, "dropped": 1, "pinned": 3}
+
+    ring.release(pinned[0])
+    assert ring.write(_frame(6)) == 4
+
+    ring.release(seq)
+    ring.release(pinned[1])
+    ring.clear_pins()
+    assert ring.stats()['pinned'] == 0
+
+
+def test_rejects_frames_of_another_shape(ring):
+    with pytest.raises(ValueError):
+        ring.write(np.zeros((5, 6, 3), np.uint8))
+
+
+def _read_in_child(ring, results):
+    seq, frame, _ = ring.read_latest(0, timeout=10)
+    results.put((seq, int(frame.sum())))
+    frame = None
+    ring.release(seq)
+    ring.close()
+
+
+def test_another_process_reads_the_same_memory(ring):
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    child = ctx.Process(target=_read_in_child, args=(ring, results))
+    child.start()
+    ring.write(_frame(3))
+    assert results.get(timeout=30) == (1, 3 * int(np.prod(SHAPE)))
+    child.join(timeout=30)
+    assert child.exitcode == 0
+    assert ring.stats()['pinned'] == 0
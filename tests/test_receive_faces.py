@@ -0,0 +1,42 @@
+"""/receive_faces parses its form the same way on the Flask and the ASGI front end."""
+import io
+import json
+
+import cv2
+import numpy as np
+import pytest
+from starlette.testclient import TestClient
+
+from app import asgi, routes
+
+
+def _form(padding):
+    _, chip = cv2.imencode('.jpg', np.zeros((64, 64, 3), np.uint8))
+    return {'boxes': json.dumps([[0, 64, 64, 0]]), 'padding': padding}, chip.tobytes()
+
+
+def _post_flask(padding):
+    data, chip = _form(padding)
+    data['face'] = (io.BytesIO(chip), 'face.jpg')
+    response = routes.app.test_client().post('/receive_faces', data=data)
+    return response.status_code, response.get_json()
+
+
+def _post_asgi(padding):
+    data, chip = _form(padding)
+    response = TestClient(asgi.app).post('/receive_faces', data=data, files={'face': ('face.jpg', chip)})
+    return response.status_code, response.json()
+
+
+@pytest.mark.parametrize('post', [_post_flask, _post_asgi], ids=['flask', 'asgi'])
+@pytest.mark.parametrize('padding', ['wide', 'nan', '1.5', '-0.1'])
+def test_bad_padding_is_rejected(post, padding):
+    status, body = post(padding)
+    assert status == 400
+    assert 'padding' in body['message']
+
+
+def test_flask_accepts_missing_padding():
+    status, body = _post_flask('')
+    assert status == 200
+    assert len(body['faces']) == 1
@@ -0,0 +1,40 @@
+"""The app run.py serves under waitress has the routes, and /receive_frame turns frames away at the limit."""
+import io
+
+import cv2
+import numpy as np
+
+import run
+from app import config, routes
+
+
+def _frame():
+    _, buffer = cv2.imencode('.jpg', np.zeros((120, 160, 3), np.uint8))
+    return {'frame': (io.BytesIO(buffer.tobytes()), 'frame.jpg')}
+
+
+def test_run_serves_the_routes():
+    rules = {rule.rule for rule in run.app.url_map.iter_rules()}
+    assert {'/receive_frame', '/receive_faces', '/receive_frame/stats', '/enroll', '/enroll/<name>'} <= rules
+
+
+def test_inflight_limit_is_below_the_server_threads():
+    assert routes.flow.limit < config.WSGI_THREADS
+
+
+def test_receive_frame_returns_429_once_the_inflight_limit_is_reached():
+    client = run.app.test_client()
+    # Frames other clients are still being recognized
+    tokens = [routes.flow.start(f'other-{i}') for i in range(routes.flow.limit)]
+    try:
+        response = client.post('/receive_frame', data=_frame(), headers={'X-Client-Id': 'test'})
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        assert response.get_json()['retry_after_ms'] > 0
+    finally:
+        for token in tokens:
+            routes.flow.finish(token)
+
+    response = client.post('/receive_frame', data=_frame(), headers={'X-Client-Id': 'test'})
+    assert response.status_code == 200
+    assert response.get_json()['flow']['fps'] > 0
@@ -0,0 +1,46 @@
+"""MySQL cursor selection, without a server: batches must not go through prepared cursors."""
+from app.storage import _MySQLCursor
+
+
+class FakeCursor:
+    def __init__(self, prepared):
+        self.prepared = prepared
+        self.calls = []
+        self.rowcount = 0
+        self.closed = False
+
+    def execute(self, sql, params=()):
+        self.calls.append(('execute', sql))
+        self.rowcount = 1
+
+    def executemany(self, sql, rows):
+        self.calls.append(('executemany', sql))
+        self.rowcount = len(rows)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self):
+        self.cursors = []
+
+    def cursor(self, prepared=False):
+        self.cursors.append(FakeCursor(prepared))
+        return self.cursors[-1]
+
+
+def test_executemany_uses_a_plain_cursor_and_execute_a_prepared_one():
+    conn = FakeConnection()
+    cursor = _MySQLCursor(conn)
+    cursor.executemany("INSERT INTO t VALUES (%s)", [(1,), (2,), (3,)])
+    assert cursor.rowcount == 3
+    cursor.execute("UPDATE t SET a = %s", (1,))
+    assert cursor.rowcount == 1
+    cursor.executemany("INSERT INTO t VALUES (%s)", [(4,)])
+    cursor.close()
+
+    plain, prepared = conn.cursors
+    assert not plain.prepared and plain.calls == [('executemany', "INSERT INTO t VALUES (%s)")] * 2
+    assert prepared.prepared and prepared.calls == [('execute', "UPDATE t SET a = %s")]
+    assert plain.closed and prepared.closed
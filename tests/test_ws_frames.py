@@ -0,0 +1,36 @@
+"""/ws/frames: one JSON reply per binary frame, busy replies when the flow is saturated."""
+import cv2
+import numpy as np
+from starlette.testclient import TestClient
+
+from app import asgi
+
+
+def _jpeg():
+    _, frame = cv2.imencode('.jpg', np.zeros((120, 160, 3), np.uint8))
+    return frame.tobytes()
+
+
+def test_frames_are_answered_in_order_and_text_is_ignored():
+    with TestClient(asgi.app) as client, client.websocket_connect('/ws/frames') as ws:
+        ws.send_text('hello')
+        ws.send_bytes(_jpeg())
+        reply = ws.receive_json()
+        assert reply['status'] == 'success'
+        assert reply['faces'] == [] and 'flow' in reply
+
+        ws.send_bytes(b'not a jpeg')
+        assert ws.receive_json()['message'] == 'Invalid image'
+
+
+def test_saturated_flow_replies_busy_with_retry_after():
+    tokens = [asgi.flow.start(f'other-{i}') for i in range(asgi.flow.limit)]
+    try:
+        with TestClient(asgi.app).websocket_connect('/ws/frames') as ws:
+            ws.send_bytes(_jpeg())
+            reply = ws.receive_json()
+    finally:
+        for token in tokens:
+            asgi.flow.finish(token)
+    assert reply['status'] == 'error' and reply['message'] == 'Server is busy'
+    assert reply['retry_after_ms'] > 0